@@ -0,0 +1,26 @@
+"""add product keyset index
+
+Revision ID: 3f9a6d2c81b4
+Revises: c4cb921ade52
+Create Date: 2026-10-18 09:12:41.203518
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f9a6d2c81b4"
+down_revision = "c4cb921ade52"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_product_created_at_product_id",
+        "product",
+        ["created_at", "product_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_created_at_product_id", table_name="product")
@@ -0,0 +1,47 @@
+"""add product partial indexes
+
+Revision ID: 5d2c7e9b1f03
+Revises: 8b1e4f7a9c20
+Create Date: 2026-10-18 11:42:05.318274
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d2c7e9b1f03"
+down_revision = "8b1e4f7a9c20"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("deleted_at IS NULL")
+
+
+def upgrade() -> None:
+    op.drop_constraint("product_name_key", "product", type_="unique")
+    op.create_index(
+        "ix_product_name_active",
+        "product",
+        ["name"],
+        unique=True,
+        postgresql_where=ACTIVE,
+    )
+    op.drop_index("ix_product_created_at_product_id", table_name="product")
+    op.create_index(
+        "ix_product_created_at_product_id_active",
+        "product",
+        ["created_at", "product_id"],
+        postgresql_where=ACTIVE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_created_at_product_id_active", table_name="product")
+    op.create_index(
+        "ix_product_created_at_product_id",
+        "product",
+        ["created_at", "product_id"],
+    )
+    op.drop_index("ix_product_name_active", table_name="product")
+    op.create_unique_constraint("product_name_key", "product", ["name"])
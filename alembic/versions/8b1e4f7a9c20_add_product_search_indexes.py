@@ -0,0 +1,61 @@
+"""add product search indexes
+
+Revision ID: 8b1e4f7a9c20
+Revises: 3f9a6d2c81b4
+Create Date: 2026-10-18 10:03:17.584120
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8b1e4f7a9c20"
+down_revision = "3f9a6d2c81b4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "product",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('simple', name), 'A') || "
+                "setweight(to_tsvector('simple', description), 'B')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_product_search_vector",
+        "product",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_product_name_trgm",
+        "product",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_product_description_trgm",
+        "product",
+        ["description"],
+        postgresql_using="gin",
+        postgresql_ops={"description": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_description_trgm", table_name="product")
+    op.drop_index("ix_product_name_trgm", table_name="product")
+    op.drop_index("ix_product_search_vector", table_name="product")
+    op.drop_column("product", "search_vector")
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha256
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def version_etag(id: UUID, updated_at: datetime) -> str:
+    """
+    Strong ETag of a single model.
+    It spells out the version, so If-Match can be checked by the UPDATE
+    itself instead of a read before it.
+    :param id: id of the model.
+    :param updated_at: last update of the model.
+    :return: quoted entity tag.
+    """
+    return f'"{id.hex}-{_microseconds(updated_at):x}"'
+
+
+def parse_version_etags(header: str, id: UUID) -> Optional[List[datetime]]:
+    """
+    Versions of a model listed in an If-Match header.
+    :param header: value of the header.
+    :param id: id of the model the request targets.
+    :return: update times matching the header, None when it matches any.
+    """
+    if header.strip() == "*":
+        return None
+    versions = []
+    # Compression weakens the tag of a response, the version it names holds
+    for tag in _entity_tags(header):
+        tag_id, _, micros = tag.strip('"').partition("-")
+        try:
+            if UUID(hex=tag_id) == id:
+                versions.append(EPOCH + timedelta(microseconds=int(micros, 16)))
+        except ValueError:
+            continue
+    return versions
+
+
+def collection_etag(count: int, last_updated_at: Optional[datetime], query: str) -> str:
+    """
+    Strong ETag of a listing.
+    Creations and deletions change the count, updates the latest update
+    time, and the query string tells pages and filters apart.
+    :param count: models matching the filter.
+    :param last_updated_at: latest update among them.
+    :param query: query string of the request.
+    :return: quoted entity tag.
+    """
+    micros = _microseconds(last_updated_at) if last_updated_at else 0
+    digest = sha256(f"{count}:{micros}:{query}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def cache_validators(
+    etag: str, last_modified: Optional[datetime] = None
+) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def not_modified(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """
+    Answer a conditional GET whose cached copy is still current.
+    If-None-Match wins over If-Modified-Since, as RFC 9110 asks.
+    :param request: request being served.
+    :param headers: validators of the current representation.
+    :return: 304 response, or None when the body must be sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = headers["ETag"].removeprefix("W/") in _entity_tags(if_none_match)
+        if current or if_none_match.strip() == "*":
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return None
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return None
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if parsedate_to_datetime(headers["Last-Modified"]) <= since:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+
+def _entity_tags(header: str) -> List[str]:
+    # Weak comparison, W/"x" and "x" name the same tag
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def _microseconds(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(microseconds=1)
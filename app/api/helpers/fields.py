@@ -0,0 +1,55 @@
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, create_model
+from starlette import status
+
+from app.api.helpers.exception import HTTPError
+
+
+def parse_fields(
+    fields: Optional[str], schema: Type[BaseModel]
+) -> Optional[Tuple[str, ...]]:
+    """
+    Fields requested by a ``fields=`` query parameter.
+    :param fields: comma separated field names, None when not given.
+    :param schema: response model the fields are taken from.
+    :return: the fields in the order of the schema, None for all of them.
+    :raises HTTPError: 400 when a name is not a field of the schema.
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",")} - {""}
+    if not names or not names <= schema.model_fields.keys():
+        raise HTTPError(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            error_message=(
+                "fields must be a comma separated list of "
+                f"{', '.join(schema.model_fields)}"
+            ),
+        )
+    return tuple(name for name in schema.model_fields if name in names)
+
+
+@lru_cache(maxsize=None)
+def partial_schema(
+    schema: Type[BaseModel], fields: Optional[Tuple[str, ...]]
+) -> Type[BaseModel]:
+    """
+    Response model keeping only some fields of another one.
+    Fields keep their type, constraints and serializers, and the models
+    are built once per combination, which ``parse_fields`` bounds.
+    :param schema: full response model.
+    :param fields: fields to keep, None for all of them.
+    :return: the partial model, or ``schema`` itself.
+    """
+    if fields is None:
+        return schema
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (schema.model_fields[name].annotation, schema.model_fields[name])
+            for name in fields
+        },
+    )
@@ -1,7 +1,6 @@
 import http
 
 from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from loguru import logger
 from sqlalchemy.exc import NoResultFound
@@ -20,12 +19,16 @@ from app.api.helpers.exception import (
     IntegrityException,
     RelatedIntegrityError,
 )
+from app.api.helpers.responses import response_class
+from app.api.helpers.validators import compatible_errors
 
 
 def register_exception_handlers(app: FastAPI):
+    json_response = response_class()
+
     @app.exception_handler(NoResultFound)
     async def no_result_found(_: Request, exc: NoResultFound) -> JSONResponse:
-        return JSONResponse(
+        return json_response(
             status_code=HTTP_404_NOT_FOUND,
             content={
                 "error_code": http.HTTPStatus(  # pylint: disable=E1101
@@ -38,7 +41,7 @@ def register_exception_handlers(app: FastAPI):
     @app.exception_handler(HTTPError)
     async def http_error_handler(_: Request, exc: HTTPError) -> JSONResponse:
         headers = getattr(exc, "headers", None)
-        return JSONResponse(
+        return json_response(
             {
                 "error_code": exc.error_code,
                 "error_message": exc.error_message,
@@ -52,13 +55,13 @@ def register_exception_handlers(app: FastAPI):
         _: Request,
         exc: RequestValidationError,
     ) -> JSONResponse:
-        return JSONResponse(
+        return json_response(
             status_code=HTTP_422_UNPROCESSABLE_ENTITY,
             content={
                 "error_code": http.HTTPStatus(  # pylint: disable=E1101
                     HTTP_422_UNPROCESSABLE_ENTITY,
                 ).name.lower(),
-                "error_message": jsonable_encoder(exc.errors()),
+                "error_message": compatible_errors(exc.errors()),
             },
         )
 
@@ -67,7 +70,7 @@ def register_exception_handlers(app: FastAPI):
         _: Request,
         exc: RequestValidationError,
     ) -> JSONResponse:
-        return JSONResponse(
+        return json_response(
             status_code=HTTP_409_CONFLICT,
             content={
                 "error_code": http.HTTPStatus(  # pylint: disable=E1101
@@ -82,7 +85,7 @@ def register_exception_handlers(app: FastAPI):
         _: Request,
         exc: RequestValidationError,
     ) -> JSONResponse:
-        return JSONResponse(
+        return json_response(
             status_code=HTTP_400_BAD_REQUEST,
             content={
                 "error_code": http.HTTPStatus(  # pylint: disable=E1101
@@ -99,7 +102,7 @@ def register_exception_handlers(app: FastAPI):
     ) -> JSONResponse:
         logger.error(f"Internal server error [{_.url.path}] {str(exc)}")
 
-        return JSONResponse(
+        return json_response(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "error_code": http.HTTPStatus(  # pylint: disable=E1101
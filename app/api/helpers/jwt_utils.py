@@ -1,17 +1,66 @@
 from datetime import datetime, timedelta
-from jose import jwt
+from hashlib import sha256
+from time import time
 
+from jose import JWTError, jwt
+from prometheus_client import Counter
+
+from app.cache.lru import LRUTTLCache
 from app.settings import settings
+from app.tracing import traced
+
+# Tokens without exp are kept as long as the ones create_token issues
+TOKEN_LIFETIME = timedelta(minutes=60)
+
+TOKEN_CACHE = Counter(
+    "jwt_cache_requests_total",
+    "Token decodes by cache outcome",
+    ["result"],
+)
+TOKEN_CACHE_HITS = TOKEN_CACHE.labels("hit")
+TOKEN_CACHE_NEGATIVE_HITS = TOKEN_CACHE.labels("negative_hit")
+TOKEN_CACHE_MISSES = TOKEN_CACHE.labels("miss")
+
+verified_tokens = LRUTTLCache(
+    max_size=settings.jwt_cache_size, ttl=TOKEN_LIFETIME.total_seconds()
+)
+rejected_tokens = LRUTTLCache(
+    max_size=settings.jwt_negative_cache_size, ttl=settings.jwt_negative_cache_ttl
+)
 
 
 def create_token(username: str) -> dict:
     payload = {
         "sub": username,
-        "exp": datetime.utcnow() + timedelta(minutes=60),
+        "exp": datetime.utcnow() + TOKEN_LIFETIME,
     }
     token = jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.algorithm)
     return {"access_token": token}
 
 
+@traced
 def decode_token(token: str):
-    return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.algorithm])
+    # Keyed by a digest, so the cache never holds usable credentials
+    key = sha256(token.encode()).digest()
+    payload = verified_tokens.get(key)
+    if payload is not None:
+        TOKEN_CACHE_HITS.inc()
+        return payload
+    error = rejected_tokens.get(key)
+    if error is not None:
+        TOKEN_CACHE_NEGATIVE_HITS.inc()
+        raise JWTError(error)
+
+    TOKEN_CACHE_MISSES.inc()
+    try:
+        payload = jwt.decode(
+            token, settings.jwt_secret_key, algorithms=[settings.algorithm]
+        )
+    except JWTError as err:
+        rejected_tokens.set(key, str(err))
+        raise
+    if "exp" in payload:
+        verified_tokens.set(key, payload, ttl=payload["exp"] - time())
+    else:
+        verified_tokens.set(key, payload)
+    return payload
@@ -0,0 +1,82 @@
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Generic, Optional, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from fastapi import HTTPException, Query, status
+from fastapi_pagination import Page
+from fastapi_pagination.bases import AbstractPage, AbstractParams, CursorRawParams
+from fastapi_pagination.cursor import Cursor, CursorParams, encode_cursor
+from fastapi_pagination.types import GreaterEqualZero
+from fastapi_pagination.utils import create_pydantic_model
+from pydantic import Field
+
+from app.api.helpers.exception import HTTPError
+
+T = TypeVar("T")
+
+
+class KeysetParams(CursorParams):
+    size: int = Query(50, ge=1, le=100, description="Page size")
+
+    def to_raw_params(self) -> CursorRawParams:
+        try:
+            return super().to_raw_params()
+        except (HTTPException, ValueError):
+            raise HTTPError(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error_message="Invalid cursor",
+            )
+
+
+class KeysetPage(AbstractPage[T], Generic[T]):
+    # Built on AbstractPage, CursorPage has grown a total and more cursors.
+    # Keyset paging only walks forward, so there is no previous page cursor
+    items: Sequence[T]
+    next_page: Optional[str] = Field(None, description="Cursor for the next page")
+
+    __params_type__ = KeysetParams
+
+    @classmethod
+    def create(
+        cls,
+        items: Sequence[T],
+        params: AbstractParams,
+        *,
+        next_: Optional[Cursor] = None,
+        **kwargs: Any,
+    ) -> "KeysetPage[T]":
+        return create_pydantic_model(
+            cls,
+            items=items,
+            next_page=encode_cursor(next_, quoted=params.quoted_cursor),
+            **kwargs,
+        )
+
+
+class CountStrategy(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
+    cached = "cached"
+
+
+class CountedPage(Page[T], Generic[T]):
+    total: Optional[GreaterEqualZero] = None
+    count_strategy: CountStrategy
+
+
+def encode_keyset_cursor(created_at: datetime, id: UUID) -> str:
+    return json.dumps([created_at.isoformat(), str(id)])
+
+
+def decode_keyset_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, id = json.loads(cursor)
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (TypeError, ValueError):
+        raise HTTPError(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            error_message="Invalid cursor",
+        )
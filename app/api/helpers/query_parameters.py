@@ -1,16 +1,21 @@
+from typing import List, Optional
 from uuid import UUID
 
+from sqlalchemy import func
 from sqlalchemy.orm import Query
 from sqlalchemy.sql.expression import and_
 
-from app.models.models import Product
+from app.models.models import PRODUCT_SEARCH_CONFIG, Product
 
 
 def product_query_parameters(
     product_id: UUID,
     name: str,
     description: str,
+    q: Optional[str] = None,
 ) -> Query:
+    # Only the filters given are rendered: a few statement shapes, each with
+    # its own compiled query, prepared statement and cached plan
     query = list()  # noqa: C408
 
     if product_id:
@@ -22,6 +27,23 @@ def product_query_parameters(
     if description:
         query.append(Product.description.ilike(f"%{description}%"))
 
+    if q:
+        query.append(Product.search_vector.op("@@")(_search_query(q)))
+
     query.append(Product.deleted_at.is_(None))
 
     return and_(*query)
+
+
+def product_search_ordering(q: Optional[str]) -> Optional[List]:
+    if not q:
+        return None
+
+    return [
+        func.ts_rank(Product.search_vector, _search_query(q)).desc(),
+        Product.product_id,
+    ]
+
+
+def _search_query(q: str):
+    return func.websearch_to_tsquery(PRODUCT_SEARCH_CONFIG, q)
@@ -0,0 +1,186 @@
+import codecs
+import csv
+import io
+import json
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Iterable, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import status
+
+from app.api.helpers.exception import HTTPError
+from app.settings import settings
+
+ROWS_PER_CHUNK = 500
+
+
+class FileFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+FILE_MEDIA_TYPES = {
+    FileFormat.ndjson: "application/x-ndjson",
+    FileFormat.csv: "text/csv",
+}
+
+
+def encode_rows(
+    rows: AsyncIterator[Sequence[Any]],
+    fields: Iterable[str],
+    file_format: FileFormat,
+) -> AsyncIterator[str]:
+    if file_format == FileFormat.csv:
+        return _encode_csv(rows, list(fields))
+    return _encode_ndjson(rows, list(fields))
+
+
+async def _encode_ndjson(rows, fields):
+    buffer, buffered = io.StringIO(), 0
+    async for row in rows:
+        buffer.write(json.dumps(dict(zip(fields, row)), default=_json_default))
+        buffer.write("\n")
+        buffered += 1
+        if buffered == ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer, buffered = io.StringIO(), 0
+    if buffered:
+        yield buffer.getvalue()
+
+
+async def _encode_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    buffered = 0
+    async for row in rows:
+        writer.writerow(row)
+        buffered += 1
+        if buffered == ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            buffered = 0
+    yield buffer.getvalue()
+
+
+class MalformedRecord(ValueError):
+    pass
+
+
+def decode_records(
+    body: AsyncIterator[bytes],
+    file_format: FileFormat,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Decode a streamed body into records, one line at a time. Lines and CSV
+    records longer than PRODUCT_IMPORT_MAX_RECORD_SIZE are not kept, they
+    come out as MalformedRecord.
+    :param body: chunks of the body.
+    :param file_format: format of the body.
+    :return: pairs of line number and record dict, or MalformedRecord.
+    """
+    max_size = settings.product_import_max_record_size
+    lines = _iter_lines(body, max_size)
+    if file_format == FileFormat.csv:
+        return _decode_csv(lines, max_size)
+    return _decode_ndjson(lines)
+
+
+def _too_long(max_size):
+    return MalformedRecord(f"Record longer than {max_size} characters")
+
+
+async def _iter_lines(body, max_size):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    # skipping: the rest of a line already reported as too long
+    pending, number, skipping = "", 0, False
+    try:
+        async for chunk in body:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                number += 1
+                if skipping:
+                    skipping = False
+                elif len(line) > max_size:
+                    yield number, _too_long(max_size)
+                else:
+                    yield number, line
+            if len(pending) > max_size:
+                if not skipping:
+                    yield number + 1, _too_long(max_size)
+                pending, skipping = "", True
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPError(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            error_message=f"Invalid UTF-8 after line {number}",
+        )
+    if pending and not skipping:
+        yield number + 1, pending
+
+
+async def _decode_ndjson(lines):
+    async for number, line in lines:
+        if isinstance(line, MalformedRecord):
+            yield number, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, MalformedRecord("Invalid JSON")
+            continue
+        if not isinstance(record, dict):
+            yield number, MalformedRecord("Expected a JSON object")
+            continue
+        yield number, record
+
+
+async def _decode_csv(lines, max_size):
+    header, record_lines, record_size, record_number = None, [], 0, 0
+    # Inside a quoted field, which then spans the next line
+    quoted = False
+    async for number, line in lines:
+        if not record_lines:
+            record_number = number
+        if isinstance(line, MalformedRecord):
+            yield record_number, line
+            record_lines, record_size, quoted = [], 0, False
+            continue
+        record_lines.append(line)
+        record_size += len(line) + 1
+        quoted ^= line.count('"') % 2 == 1
+        if quoted:
+            if record_size > max_size:
+                # Most likely a stray quote, the record starts over after it
+                yield record_number, _too_long(max_size)
+                record_lines, record_size, quoted = [], 0, False
+            continue
+
+        row = next(csv.reader(["\n".join(record_lines) + "\n"]), [])
+        record_lines, record_size = [], 0
+        if not row:
+            continue
+        if header is None:
+            header = row
+        elif len(row) != len(header):
+            yield record_number, MalformedRecord(
+                f"Expected {len(header)} fields, got {len(row)}"
+            )
+        else:
+            yield record_number, dict(zip(header, row))
+
+    if record_lines:
+        yield record_number, MalformedRecord("Unterminated quoted field")
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
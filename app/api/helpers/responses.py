@@ -0,0 +1,72 @@
+from decimal import Decimal
+from typing import Any, Mapping, Optional, Type
+from uuid import UUID
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from app.settings import settings
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson.
+
+    UUIDs, datetimes and enums are serialized natively, Decimals as floats
+    like ``jsonable_encoder`` does and asyncpg's own UUID type as a string.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def response_class() -> Type[JSONResponse]:
+    """Response class picked by the JSON_RESPONSE_CLASS setting."""
+    if settings.json_response_class == "orjson":
+        return ORJSONResponse
+    return JSONResponse
+
+
+def fast_response(
+    content: Any,
+    schema: Type[BaseModel],
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> JSONResponse:
+    """
+    Serialize content already shaped as the route's response model.
+    FastAPI would validate it again against the model and run it through
+    jsonable_encoder, here it is dumped as it is. Only orjson takes the
+    Decimals and UUIDs as they are, for the standard library json they are
+    still turned into JSON types.
+    :param content: instance of ``schema`` or ORM object with its fields.
+    :param schema: response model of the route.
+    :param status_code: status of the response.
+    :param headers: extra headers of the response.
+    :return: the response, validated like FastAPI does with the fast path off.
+    """
+    fields = set(schema.model_fields)
+    json_response = response_class()
+    if not settings.json_response_fast_path:
+        if isinstance(content, BaseModel):
+            content = content.model_dump(by_alias=True)
+        content = schema.model_validate(content, from_attributes=True).model_dump(
+            mode="json", by_alias=True
+        )
+    elif isinstance(content, BaseModel):
+        mode = "python" if json_response is ORJSONResponse else "json"
+        content = content.model_dump(mode=mode, by_alias=True, include=fields)
+    else:
+        content = {field: getattr(content, field) for field in fields}
+        if json_response is not ORJSONResponse:
+            content = jsonable_encoder(content)
+    return json_response(content, status_code=status_code, headers=headers)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
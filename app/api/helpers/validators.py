@@ -1,18 +1,56 @@
-def empty_string_validator(text):
-    if not text.strip():
-        raise ValueError("Field cannot be an empty string")
-    return text.strip()
+from decimal import Decimal
+from typing import Annotated, Iterable, List
 
+from pydantic import Field, PlainSerializer, StringConstraints
 
-def decimal_validator(number):
-    if len(str(number).split(".")[-1]) > 2:
-        raise ValueError("The value cannot have more than two decimal places")
-    if len(str(number).replace(".", "")) > 10:
-        raise ValueError("The value exceeds the expected size.")
-    return number
+# Stripped, then at least one character left
+NonEmptyStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
 
+PositiveInt = Annotated[int, Field(gt=0)]
 
-def number_validator(number):
-    if number <= 0:
-        raise ValueError("The field must be greater than zero.")
-    return number
+# Money as the NUMERIC(10, 2) column holds it, still a number in JSON
+Price = Annotated[
+    Decimal,
+    Field(gt=0, max_digits=10, decimal_places=2),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
+
+# Messages clients relied on before the constrained types, by error type
+COMPATIBLE_MESSAGES = {
+    "missing": "field required",
+    "decimal_parsing": "value is not a valid float",
+    "float_parsing": "value is not a valid float",
+    "int_parsing": "value is not a valid integer",
+    "int_from_float": "value is not a valid integer",
+    "uuid_parsing": "value is not a valid uuid",
+    "uuid_type": "value is not a valid uuid",
+    "uuid_version": "uuid version 4 expected",
+    "decimal_max_places": "The value cannot have more than two decimal places",
+    "decimal_max_digits": "The value exceeds the expected size.",
+    "decimal_whole_digits": "The value exceeds the expected size.",
+}
+
+
+def compatible_errors(errors: Iterable[dict]) -> List[dict]:
+    """
+    Reshape validation errors the way the API reported them so far.
+    :param errors: errors of a pydantic ValidationError.
+    :return: errors with only loc, msg and type, no input echoed back.
+    """
+    return [
+        {
+            "loc": list(error["loc"]),
+            "msg": _compatible_message(error),
+            "type": error["type"],
+        }
+        for error in errors
+    ]
+
+
+def _compatible_message(error: dict) -> str:
+    error_type, ctx = error["type"], error.get("ctx", {})
+    if error_type == "greater_than" and ctx.get("gt") == 0:
+        return "The field must be greater than zero."
+    if error_type == "string_too_short" and ctx.get("min_length") == 1:
+        return "Field cannot be an empty string"
+    return COMPATIBLE_MESSAGES.get(error_type, error["msg"])
@@ -0,0 +1,3 @@
+from app.api.metrics.views import router
+
+__all__ = ["router"]
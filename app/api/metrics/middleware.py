@@ -0,0 +1,157 @@
+import logging
+from time import perf_counter
+from typing import Dict, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.query_stats import RequestSQLStats, request_sql_stats
+from app.settings import settings
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route template",
+    ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, float("inf")),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording request metrics per route template.
+
+    Labelled children are cached, so a request costs a few dict lookups
+    on top of the metric updates themselves.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._templates: Dict[object, str] = {}
+        self._children: Dict[Tuple[str, str, int], tuple] = {}
+        self._in_progress: Dict[str, Gauge] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        size = 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = self._in_progress.get(method)
+        if in_progress is None:
+            in_progress = self._in_progress[method] = REQUESTS_IN_PROGRESS.labels(
+                method
+            )
+        in_progress.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = perf_counter() - start
+            in_progress.dec()
+            requests, duration, response_size = self._labelled(
+                method, self._route(scope), status_code
+            )
+            requests.inc()
+            duration.observe(elapsed)
+            response_size.observe(size)
+
+    def _labelled(self, method: str, route: str, status_code: int) -> tuple:
+        key = (method, route, status_code)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (
+                REQUESTS.labels(method, route, str(status_code)),
+                REQUEST_DURATION.labels(method, route),
+                RESPONSE_SIZE.labels(method, route),
+            )
+        return children
+
+    def _route(self, scope: Scope) -> str:
+        # Raw paths would give a label per product id, the template does not
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = self._templates[endpoint] = _find_template(
+                scope["app"], endpoint
+            )
+        return template
+
+
+class SQLStatsMiddleware:
+    """Counts the SQL statements of each request and their total time.
+
+    The totals go out in a Server-Timing header, requests running too many
+    statements, usually an N+1, are logged. The header leaves with the
+    response start, so it misses what runs after: the rows of streamed
+    responses and the COMMIT of the session dependency. The log line is
+    written once the request is over and counts them all.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats()
+        server_timing = settings.server_timing_enabled
+
+        async def send_with_timing(message: Message) -> None:
+            if server_timing and message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}',
+                )
+            await send(message)
+
+        token = request_sql_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_sql_stats.reset(token)
+            if stats.count > settings.db_statements_per_request_warning:
+                logging.warning(
+                    f"{scope['method']} {scope['path']} ran {stats.count} "
+                    f"statements in {stats.duration:.3f}s"
+                )
+
+
+def _find_template(app, endpoint) -> str:
+    for route in app.routes:
+        # Mounts hand their sub application down as the endpoint
+        if endpoint in (getattr(route, "endpoint", None), getattr(route, "app", None)):
+            return route.path
+    return UNMATCHED_ROUTE
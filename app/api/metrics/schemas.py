@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+
+
+class LookupStatsSchema(BaseModel):
+    backend: str = Field(..., description="Backend in use: redis, memory or none")
+    hits: int
+    misses: int
+    hit_rate: float = Field(..., ge=0, le=1)
+
+
+class CacheMetricsSchema(BaseModel):
+    product: LookupStatsSchema = Field(
+        ..., description="Product reads, counted by this worker"
+    )
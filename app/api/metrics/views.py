@@ -0,0 +1,36 @@
+import os
+
+from fastapi import APIRouter, Depends, Response, status
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from app.api.metrics.schemas import CacheMetricsSchema
+from app.cache import CacheBackend, get_product_cache
+
+router = APIRouter()
+
+
+@router.get("", include_in_schema=False)
+async def get_metrics() -> Response:
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Each uvicorn worker writes its samples to the shared directory
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get(
+    "/cache",
+    status_code=status.HTTP_200_OK,
+    response_model=CacheMetricsSchema,
+)
+async def get_cache_metrics(
+    product_cache: CacheBackend = Depends(get_product_cache),
+):
+    return {"product": product_cache.stats()}
@@ -1,51 +1,119 @@
-from typing import Optional
+from datetime import datetime
+from typing import Any, List, Optional
 
-from pydantic import UUID4, BaseModel, Field, validator
+from pydantic import UUID4, BaseModel, ConfigDict, Field, conlist
 
-from app.api.helpers.validators import (
-    decimal_validator,
-    empty_string_validator,
-    number_validator,
-)
+from app.api.helpers.validators import NonEmptyStr, PositiveInt, Price
+from app.settings import settings
 
 
 class ProductCreateSchema(BaseModel):
-    name: str = Field(..., description="Product name")
-    description: str = Field(..., description="Brief description of the product")
-    value: float = Field(..., description="Price of the product")
-    quantity: int = Field(..., description="Quantity of product in stock")
+    model_config = ConfigDict(from_attributes=True)
 
-    _empty_string_validator = validator("name", "description", allow_reuse=True)(
-        empty_string_validator
-    )
-    _number_validator = validator("value", "quantity", allow_reuse=True)(
-        number_validator
+    name: NonEmptyStr = Field(..., max_length=256, description="Product name")
+    description: NonEmptyStr = Field(
+        ..., description="Brief description of the product"
     )
-    _value_validator = validator("value", allow_reuse=True)(decimal_validator)
-
-    class Config:
-        orm_mode = True
+    value: Price = Field(..., description="Price of the product")
+    quantity: PositiveInt = Field(..., description="Quantity of product in stock")
 
 
 class ProductSchema(ProductCreateSchema):
     product_id: UUID4 = Field(..., description="")
 
-    class Config:
-        orm_mode = True
+
+class ProductCacheSchema(ProductSchema):
+    # Kept with the cached product to answer conditional requests
+    updated_at: datetime
 
 
 class ProductUpdateSchema(BaseModel):
-    name: Optional[str] = Field(None, description="Product name")
-    description: Optional[str] = Field(
+    name: Optional[NonEmptyStr] = Field(
+        None, max_length=256, description="Product name"
+    )
+    description: Optional[NonEmptyStr] = Field(
         None, description="Brief description of the product"
     )
-    value: Optional[float] = Field(None, description="Price of the product")
-    quantity: Optional[int] = Field(None, description="Quantity of product in stock")
+    value: Optional[Price] = Field(None, description="Price of the product")
+    quantity: Optional[PositiveInt] = Field(
+        None, description="Quantity of product in stock"
+    )
+
+
+ProductBatchCreateSchema = conlist(
+    ProductCreateSchema, min_length=1, max_length=settings.product_batch_max_size
+)
 
-    _empty_string_validator = validator("name", "description", allow_reuse=True)(
-        empty_string_validator
+
+class ProductBatchConflictSchema(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    name: str = Field(..., description="Product name")
+    error_code: str = "conflict"
+    error_message: str = "Product name already exists"
+
+
+class ProductBatchCreateResponseSchema(BaseModel):
+    created: List[ProductSchema] = Field(..., description="Products created")
+    conflicts: List[ProductBatchConflictSchema] = Field(
+        ..., description="Products skipped because the name already exists"
     )
-    _number_validator = validator("value", "quantity", allow_reuse=True)(
-        number_validator
+
+
+class ProductImportErrorSchema(BaseModel):
+    line: int = Field(..., description="Line of the record in the body")
+    error_code: str = "unprocessable_entity"
+    error_message: Any = Field(..., description="Why the record was rejected")
+
+
+class ProductImportSummarySchema(BaseModel):
+    inserted: int = Field(0, description="Products created")
+    updated: int = Field(0, description="Existing products updated by name")
+    rejected: int = Field(0, description="Records that failed validation")
+    errors: List[ProductImportErrorSchema] = Field(
+        [], description="Rejected records, capped by PRODUCT_IMPORT_MAX_ERRORS"
     )
-    _value_validator = validator("value", allow_reuse=True)(decimal_validator)
+
+
+class ProductBatchUpdateItemSchema(ProductUpdateSchema):
+    product_id: UUID4 = Field(..., description="Product to update")
+
+
+ProductBatchUpdateSchema = conlist(
+    ProductBatchUpdateItemSchema,
+    min_length=1,
+    max_length=settings.product_batch_max_size,
+)
+
+
+class ProductBatchUpdateResponseSchema(BaseModel):
+    updated: List[UUID4] = Field(..., description="Products updated")
+    missing: List[UUID4] = Field(
+        ..., description="Products not found or already deleted"
+    )
+
+
+class ProductBatchDeleteResponseSchema(BaseModel):
+    deleted: List[UUID4] = Field(
+        ..., description="Products deleted, now or before this request"
+    )
+    missing: List[UUID4] = Field(..., description="Products not found")
+
+
+class StockDecrementSchema(BaseModel):
+    quantity: PositiveInt = Field(..., description="Units to take from stock")
+
+
+class StockDecrementItemSchema(StockDecrementSchema):
+    product_id: UUID4 = Field(..., description="Product to take units from")
+
+
+StockBatchDecrementSchema = conlist(
+    StockDecrementItemSchema,
+    min_length=1,
+    max_length=settings.product_batch_max_size,
+)
+
+
+class StockSchema(BaseModel):
+    product_id: UUID4 = Field(..., description="")
+    quantity: int = Field(..., description="Quantity left in stock")
@@ -1,20 +1,48 @@
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status
-from fastapi_pagination import Page
+from fastapi import APIRouter, Depends, Header, Query, Request, status
+from fastapi_pagination.api import set_page
+from starlette.responses import StreamingResponse
 
 from app.api.error_response.schema import MessageError, NotFoundError
-from app.api.helpers.query_parameters import product_query_parameters
+from app.api.helpers.conditional import (
+    cache_validators,
+    collection_etag,
+    not_modified,
+    parse_version_etags,
+    version_etag,
+)
+from app.api.helpers.fields import parse_fields, partial_schema
+from app.api.helpers.pagination import CountedPage, CountStrategy, KeysetPage
+from app.api.helpers.query_parameters import (
+    product_query_parameters,
+    product_search_ordering,
+)
+from app.api.helpers.records import FILE_MEDIA_TYPES, FileFormat, decode_records
+from app.api.helpers.responses import fast_response
 from app.api.product.schemas import (
+    ProductBatchCreateResponseSchema,
+    ProductBatchCreateSchema,
+    ProductBatchDeleteResponseSchema,
+    ProductBatchUpdateResponseSchema,
+    ProductBatchUpdateSchema,
     ProductCreateSchema,
+    ProductImportSummarySchema,
     ProductSchema,
     ProductUpdateSchema,
+    StockBatchDecrementSchema,
+    StockDecrementSchema,
+    StockSchema,
 )
-from app.service.product_service import ProductService
+from app.service.product_service import ProductService, ReadOnlyProductService
 
 router = APIRouter()
 
+FIELDS_DESCRIPTION = (
+    "Comma separated fields of the product to return, all of them by default"
+)
+
 
 @router.post(
     "",
@@ -31,21 +59,154 @@ async def create_product(
     return await product_service.create_product(payload)
 
 
+@router.post(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=ProductBatchCreateResponseSchema,
+    responses={
+        status.HTTP_409_CONFLICT: {"model": MessageError},
+    },
+)
+async def create_products(
+    payload: ProductBatchCreateSchema,
+    product_service: ProductService = Depends(ProductService),
+):
+    return await product_service.create_products(payload)
+
+
+@router.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    response_model=ProductImportSummarySchema,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"model": MessageError},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {media_type: {} for media_type in FILE_MEDIA_TYPES.values()},
+        },
+    },
+)
+async def import_products(
+    request: Request,
+    product_service: ProductService = Depends(ProductService),
+    file_format: FileFormat = Query(FileFormat.ndjson, alias="format"),
+):
+    return await product_service.import_products(
+        decode_records(request.stream(), file_format)
+    )
+
+
 @router.get(
     "",
     status_code=status.HTTP_200_OK,
-    response_model=Page[ProductSchema],
+    response_model=CountedPage[ProductSchema],
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {"description": "Listing not modified"},
+    },
 )
 async def get_all(
-    product_service: ProductService = Depends(ProductService),
+    request: Request,
+    product_service: ProductService = Depends(ReadOnlyProductService),
+    product_id: Optional[UUID] = None,
+    name: Optional[str] = None,
+    description: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Full-text search, ranked by relevance"),
+    count: CountStrategy = Query(
+        CountStrategy.exact, description="How the total of products is computed"
+    ),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    query_filter = product_query_parameters(
+        product_id=product_id, name=name, description=description, q=q
+    )
+    selected_fields = parse_fields(fields, ProductSchema)
+    # Only the selected columns are read, the page holds just those fields
+    page_schema = CountedPage[partial_schema(ProductSchema, selected_fields)]
+    if count != CountStrategy.exact:
+        with set_page(page_schema):
+            page = await product_service.get_all_products(
+                query_filter=query_filter,
+                order_by=product_search_ordering(q),
+                count_strategy=count,
+                fields=selected_fields,
+            )
+        return fast_response(page, page_schema)
+
+    # The fingerprint counts the filter anyway, the page reuses its count
+    total, last_updated_at = await product_service.get_products_fingerprint(
+        query_filter
+    )
+    headers = cache_validators(
+        collection_etag(total, last_updated_at, request.url.query)
+    )
+    response = not_modified(request, headers)
+    if response is not None:
+        return response
+    with set_page(page_schema):
+        page = await product_service.get_all_products(
+            query_filter=query_filter,
+            order_by=product_search_ordering(q),
+            count_strategy=count,
+            total=total,
+            fields=selected_fields,
+        )
+    return fast_response(page, page_schema, headers=headers)
+
+
+@router.get(
+    "/cursor",
+    status_code=status.HTTP_200_OK,
+    response_model=KeysetPage[ProductSchema],
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"model": MessageError},
+    },
+)
+async def get_all_by_cursor(
+    product_service: ProductService = Depends(ReadOnlyProductService),
+    product_id: Optional[UUID] = None,
+    name: Optional[str] = None,
+    description: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Full-text search"),
+):
+    query_filter = product_query_parameters(
+        product_id=product_id, name=name, description=description, q=q
+    )
+    page = await product_service.get_all_products_by_cursor(query_filter=query_filter)
+    return fast_response(page, KeysetPage[ProductSchema])
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {media_type: {} for media_type in FILE_MEDIA_TYPES.values()},
+        },
+    },
+)
+async def export_products(
+    product_service: ProductService = Depends(ReadOnlyProductService),
+    file_format: FileFormat = Query(FileFormat.ndjson, alias="format"),
     product_id: Optional[UUID] = None,
     name: Optional[str] = None,
     description: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Full-text search"),
 ):
     query_filter = product_query_parameters(
-        product_id=product_id, name=name, description=description
+        product_id=product_id, name=name, description=description, q=q
+    )
+    return StreamingResponse(
+        product_service.export_products(query_filter, file_format),
+        media_type=FILE_MEDIA_TYPES[file_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="products.{file_format.value}"'
+            ),
+        },
     )
-    return await product_service.get_all_products(query_filter=query_filter)
 
 
 @router.get(
@@ -53,14 +214,45 @@ async def get_all(
     status_code=status.HTTP_200_OK,
     response_model=ProductSchema,
     responses={
+        status.HTTP_304_NOT_MODIFIED: {"description": "Product not modified"},
         status.HTTP_404_NOT_FOUND: {"model": NotFoundError},
     },
 )
 async def get_by_product_id(
     product_id: UUID,
+    request: Request,
+    product_service: ProductService = Depends(ReadOnlyProductService),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    selected_fields = parse_fields(fields, ProductSchema)
+    product = await product_service.get_by_product_id(product_id, selected_fields)
+    etag = version_etag(product.product_id, product.updated_at)
+    if selected_fields is not None:
+        # Part of the same version, equivalent to it but not the same bytes
+        etag = f"W/{etag}"
+    headers = cache_validators(etag, product.updated_at)
+    response = not_modified(request, headers)
+    if response is not None:
+        return response
+    return fast_response(
+        product, partial_schema(ProductSchema, selected_fields), headers=headers
+    )
+
+
+@router.patch(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=ProductBatchUpdateResponseSchema,
+    responses={
+        status.HTTP_409_CONFLICT: {"model": MessageError},
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": MessageError},
+    },
+)
+async def update_products(
+    payload: ProductBatchUpdateSchema,
     product_service: ProductService = Depends(ProductService),
 ):
-    return await product_service.get_by_product_id(product_id)
+    return await product_service.update_products(payload)
 
 
 @router.patch(
@@ -70,14 +262,51 @@ async def get_by_product_id(
         status.HTTP_409_CONFLICT: {"model": MessageError},
         status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": MessageError},
         status.HTTP_404_NOT_FOUND: {"model": NotFoundError},
+        status.HTTP_412_PRECONDITION_FAILED: {"model": MessageError},
     },
 )
 async def update_by_product_id(
     product_id: UUID,
     payload: ProductUpdateSchema,
     product_service: ProductService = Depends(ProductService),
+    if_match: Optional[str] = Header(
+        None, description="Update only while the product still has this ETag"
+    ),
 ):
-    return await product_service.update_by_product_id(product_id, payload)
+    versions = None if if_match is None else parse_version_etags(if_match, product_id)
+    return await product_service.update_by_product_id(product_id, payload, versions)
+
+
+@router.post(
+    "/stock/decrement",
+    status_code=status.HTTP_200_OK,
+    response_model=List[StockSchema],
+    responses={
+        status.HTTP_409_CONFLICT: {"model": MessageError},
+    },
+)
+async def decrement_stocks(
+    payload: StockBatchDecrementSchema,
+    product_service: ProductService = Depends(ProductService),
+):
+    return await product_service.decrement_stocks(payload)
+
+
+@router.post(
+    "/{product_id}/stock/decrement",
+    status_code=status.HTTP_200_OK,
+    response_model=StockSchema,
+    responses={
+        status.HTTP_409_CONFLICT: {"model": MessageError},
+        status.HTTP_404_NOT_FOUND: {"model": NotFoundError},
+    },
+)
+async def decrement_stock(
+    product_id: UUID,
+    payload: StockDecrementSchema,
+    product_service: ProductService = Depends(ProductService),
+):
+    return await product_service.decrement_stock(product_id, payload)
 
 
 @router.delete(
@@ -92,3 +321,18 @@ async def delete_by_product_id(
     product_service: ProductService = Depends(ProductService),
 ):
     return await product_service.delete_by_product_id(product_id)
+
+
+@router.delete(
+    "",
+    status_code=status.HTTP_200_OK,
+    response_model=ProductBatchDeleteResponseSchema,
+    responses={
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {"model": MessageError},
+    },
+)
+async def delete_products(
+    ids: List[UUID] = Query(..., description="Products to delete"),
+    product_service: ProductService = Depends(ProductService),
+):
+    return await product_service.delete_products(ids)
@@ -2,7 +2,7 @@ from fastapi import Depends
 from fastapi.routing import APIRouter
 from starlette import status
 
-from app.api import docs, product, auth
+from app.api import docs, product, auth, metrics
 from app.api.error_response.schema import MessageError
 from app.api.helpers.authenticator import authenticate_jwt
 
@@ -25,3 +25,9 @@ api_router.include_router(
     prefix="/token",
     tags=["token"]
 )
+
+api_router.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["metrics"]
+)
@@ -3,15 +3,18 @@ from importlib import metadata
 from pathlib import Path
 
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi_pagination import add_pagination
 from loguru import logger
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.helpers.handler import register_exception_handlers
+from app.api.helpers.responses import response_class
+from app.api.metrics.middleware import PrometheusMiddleware, SQLStatsMiddleware
 from app.api.router import api_router
+from app.compression import CompressionMiddleware, PrecompressedStaticFiles
 from app.lifetime import shutdown, startup
 from app.settings import settings
+from app.tracing import setup_tracing
 
 APP_ROOT = Path(__file__).parent
 ROOT = Path(__file__).parent.parent
@@ -41,6 +44,7 @@ def get_app() -> FastAPI:
         redoc_url=None,
         openapi_url="/openapi.json",
         debug=settings.debug,
+        default_response_class=response_class(),
     )
 
     app.add_middleware(
@@ -51,13 +55,20 @@ def get_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(SQLStatsMiddleware)
+    # Adds the request span middleware around the ones above
+    setup_tracing(app)
+    # Outermost, so the latency covers every other middleware
+    app.add_middleware(PrometheusMiddleware)
+
     app.on_event("startup")(startup(app))
     app.on_event("shutdown")(shutdown(app))
 
     app.include_router(router=api_router)
     app.mount(
         "/static",
-        StaticFiles(directory=APP_ROOT / "static"),
+        PrecompressedStaticFiles(directory=APP_ROOT / "static"),
         name="static",
     )
 
@@ -0,0 +1,4 @@
+from app.cache.backends import CacheBackend
+from app.cache.dependencies import get_product_cache
+
+__all__ = ["CacheBackend", "get_product_cache"]
@@ -0,0 +1,128 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from app.cache.lru import LRUTTLCache
+
+
+class CacheBackend(ABC):
+    """Base class for cache backends storing serialized payloads."""
+
+    # Reported by stats(), as CACHE_BACKEND names the backend
+    name: str
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        """
+        Store a value.
+        :param key: key of value.
+        :param value: serialized payload.
+        :param ttl: seconds until expiry, defaults to the backend ttl.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Drop a value, missing keys are ignored."""
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            await self.delete(key)
+
+    @abstractmethod
+    async def _get(self, key: str) -> Optional[str]:
+        """Stored value or None, without counting the lookup."""
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class NullCacheBackend(CacheBackend):
+    """Backend that never stores anything."""
+
+    name = "none"
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+    async def _get(self, key: str) -> Optional[str]:
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU backend with a time to live per entry.
+
+    Each process has its own entries and only sees its own invalidations,
+    so it is only consistent with a single worker.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_size: int, ttl: int):
+        super().__init__()
+        self._cache = LRUTTLCache(max_size=max_size, ttl=ttl)
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def _get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Backend for any server speaking the Redis protocol.
+
+    Requires the optional ``redis`` package (``poetry install -E cache``).
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int, prefix: str = ""):
+        from redis import asyncio as aioredis  # noqa: WPS433
+
+        super().__init__()
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = aioredis.from_url(url, decode_responses=True)
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        await self._client.set(f"{self.prefix}{key}", value, ex=ttl or self.ttl)
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(f"{self.prefix}{key}")
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        keys = [f"{self.prefix}{key}" for key in keys]
+        if keys:
+            await self._client.delete(*keys)
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await self._client.get(f"{self.prefix}{key}")
+
+    async def close(self) -> None:
+        await self._client.close()
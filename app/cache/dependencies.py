@@ -0,0 +1,37 @@
+import logging
+from functools import lru_cache
+
+from app.cache.backends import (
+    CacheBackend,
+    MemoryCacheBackend,
+    NullCacheBackend,
+    RedisCacheBackend,
+)
+from app.settings import settings
+
+
+@lru_cache
+def get_product_cache() -> CacheBackend:
+    backend = settings.cache_backend
+    if backend is None:
+        backend = "redis" if settings.cache_redis_url else "none"
+
+    if backend == "redis":
+        return RedisCacheBackend(
+            settings.cache_redis_url,
+            ttl=settings.cache_ttl,
+            prefix=f"{settings.service_name}:",
+        )
+    if backend == "memory":
+        if settings.workers_count > 1:
+            # A write only invalidates the entries of its own worker, the
+            # others would keep serving the old product and its ETag
+            logging.warning(
+                "CACHE_BACKEND=memory needs a single worker, product cache off"
+            )
+            return NullCacheBackend()
+        return MemoryCacheBackend(
+            max_size=settings.cache_max_size,
+            ttl=settings.cache_ttl,
+        )
+    return NullCacheBackend()
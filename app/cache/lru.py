@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable, Optional
+
+
+class LRUTTLCache:
+    """Bounded in-process mapping with per-entry expiry.
+
+    The least recently used entry is evicted once ``max_size`` is reached.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a value by key.
+        :param key: key of value.
+        :return: the value or None when missing or expired.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Set a value by key.
+        :param key: key of value.
+        :param value: value to store.
+        :param ttl: seconds until expiry, defaults to the cache ttl.
+        """
+        self._data[key] = (value, monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -0,0 +1,266 @@
+"""
+Response compression.
+
+Responses are compressed with the best coding the client accepts among
+gzip, brotli and zstd. Brotli and zstd need the ``compression`` extra
+(``poetry install -E compression``). Static files are compressed once at
+build time by ``app.precompress``.
+"""
+import os
+import zlib
+from mimetypes import guess_type
+from typing import Dict, List, Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.precompress import PRECOMPRESSED
+from app.settings import settings
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+}
+
+
+class GzipEncoder:
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = 4):
+        import brotli  # noqa: WPS433
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int = 3):
+        import zstandard  # noqa: WPS433
+
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            self._flush_block
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+ENCODERS = {"zstd": ZstdEncoder, "br": BrotliEncoder, "gzip": GzipEncoder}
+
+
+def available_encodings() -> List[str]:
+    """Codings enabled in settings whose library is installed."""
+    encodings = []
+    for encoding in settings.compression_encodings:
+        try:
+            ENCODERS[encoding]()
+        except (ImportError, KeyError):
+            continue
+        encodings.append(encoding)
+    return encodings
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header.
+    :param accept_encoding: value of the header.
+    :return: quality of each coding, ``*`` included.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        encoding, _, params = item.partition(";")
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        name, _, value = params.partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[encoding] = quality
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """
+    Pick the coding of a response.
+    :param accept_encoding: Accept-Encoding header of the request.
+    :param encodings: codings the server offers, preferred first.
+    :return: highest quality coding, ties going to the server preference.
+    """
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses as they are sent.
+
+    Bodies under ``minimum_size`` go out as they are. Streaming bodies are
+    compressed chunk by chunk and flushed, so the client never waits for
+    the end of the stream to receive what was already produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = (
+            settings.compression_minimum_size if minimum_size is None else minimum_size
+        )
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = None
+        # HEAD bodies are empty, their Content-Length must stay the real one
+        if scope["type"] == "http" and scope["method"] != "HEAD":
+            encoding = negotiate_encoding(
+                Headers(scope=scope).get("accept-encoding", ""), self.encodings
+            )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start" and self._compressible(message):
+                # Held until the first chunk tells whether it is worth it
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or (
+                start_message is None and encoder is None
+            ):
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                start, start_message = start_message, None
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                body = encoder.compress(body) if more_body else encoder.finish(body)
+                _encoded_headers(start, encoding, None if more_body else len(body))
+                await send(start)
+            else:
+                body = encoder.compress(body) if more_body else encoder.finish(body)
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, message: Message) -> bool:
+        if message["status"] < 200 or message["status"] in {204, 304}:
+            return False
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        content_length = headers.get("content-length")
+        if content_length is not None and int(content_length) < self.minimum_size:
+            return False
+        content_type = headers.get("content-type", "").partition(";")[0].strip()
+        return (
+            content_type.startswith("text/")
+            or content_type.endswith("+json")
+            or content_type in COMPRESSIBLE_TYPES
+        )
+
+
+def _encoded_headers(
+    message: Message, encoding: str, content_length: Optional[int]
+) -> None:
+    headers = MutableHeaders(scope=message)
+    headers["Content-Encoding"] = encoding
+    headers.add_vary_header("Accept-Encoding")
+    del headers["Content-Length"]
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        # Same content in other bytes, the tags are only weakly equal now
+        headers["ETag"] = f"W/{etag}"
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving the ``.br`` and ``.gz`` siblings of a file.
+
+    The siblings come from the build step, so nothing is compressed per
+    request, and every file can be cached for ``STATIC_CACHE_MAX_AGE``.
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        response = None
+        for encoding, suffix in PRECOMPRESSED.items():
+            if accepted.get(encoding, accepted.get("*", 0.0)) <= 0:
+                continue
+            try:
+                sibling_stat = os.stat(f"{full_path}{suffix}")
+            except FileNotFoundError:
+                continue
+            response = FileResponse(
+                f"{full_path}{suffix}",
+                status_code=status_code,
+                stat_result=sibling_stat,
+                method=scope["method"],
+                media_type=guess_type(str(full_path))[0] or "text/plain",
+                headers={"Content-Encoding": encoding},
+            )
+            break
+        if response is None:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                stat_result=stat_result,
+                method=scope["method"],
+            )
+        max_age = settings.static_cache_max_age
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+        response.headers.add_vary_header("Accept-Encoding")
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
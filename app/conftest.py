@@ -8,16 +8,16 @@ import pytest_asyncio
 from factory.fuzzy import FuzzyFloat
 from fastapi import FastAPI
 from httpx import AsyncClient, Headers
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_scoped_session,
-    create_async_engine,
-)
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
 from sqlalchemy.orm import sessionmaker
 
 from app.api.helpers.jwt_utils import create_token
+from app.cache import get_product_cache
+from app.cache.backends import MemoryCacheBackend
 from app.db.base import Base
 from app.db.dependencies import db_session as dependency_db_session
+from app.db.dependencies import read_only_db_session
+from app.db.engine import create_engine
 from app.models.models import Product
 from app.settings import settings
 
@@ -29,10 +29,7 @@ async def db_session() -> AsyncSession:
         f"{settings.db_url.port}/postgres",
     )
 
-    engine = create_async_engine(
-        db_url_pg,
-        echo=False,
-    )
+    engine = create_engine(db_url_pg, name="test", echo=False)
     session_factory = async_scoped_session(
         sessionmaker(
             engine,
@@ -60,11 +57,20 @@ def override_get_db(db_session: AsyncSession) -> Callable:
 
 
 @pytest.fixture()
-def app(override_get_db: Callable) -> FastAPI:
+def product_cache() -> MemoryCacheBackend:
+    return MemoryCacheBackend(max_size=100, ttl=60)
+
+
+@pytest.fixture()
+def app(override_get_db: Callable, product_cache: MemoryCacheBackend) -> FastAPI:
     from app.application import get_app  # noqa: WPS433
+    from app.service.product_service import product_counts  # noqa: WPS433
 
     app = get_app()
+    product_counts.clear()
     app.dependency_overrides[dependency_db_session] = override_get_db
+    app.dependency_overrides[read_only_db_session] = override_get_db
+    app.dependency_overrides[get_product_cache] = lambda: product_cache
     return app
 
 
@@ -115,7 +121,7 @@ async def product_mocked(product_factory):
 
 @pytest.fixture
 def headers():
-    token = create_token(username="Itachi Uchiha")
+    token = create_token(username="Itachi Uchiha")["access_token"]
     return Headers(
         {"Authorization": f"Bearer {token}", "s3-context": "mock_s3"},
     )
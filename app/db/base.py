@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any, Tuple
 
-from sqlalchemy import Column, DateTime, Table, func, text
+from sqlalchemy import Column, DateTime, Index, Table, func, text
 from sqlalchemy.orm import as_declarative, declarative_mixin, declared_attr
 
 from app.db.meta import meta
@@ -22,11 +22,14 @@ class CreatedAtMixin:
 class UpdatedAtMixin:
     @declared_attr
     def updated_at(cls):  # pylint: disable=E0213
+        # Stamped by the database clock on every write path, ORM or raw SQL,
+        # when the statement runs. Commit order may still differ: a slower
+        # transaction can commit an older stamp after a newer one is visible.
         return Column(
             DateTime(timezone=True),
             server_default=func.now(),
-            default=datetime.now,
-            onupdate=datetime.now,
+            default=func.clock_timestamp(),
+            onupdate=func.clock_timestamp(),
         )
 
 
@@ -40,6 +43,20 @@ class DeletedAtMixin:
             server_default=text("NULL"),
         )
 
+    @staticmethod
+    def active_index(name: str, *columns: str, **kwargs: Any) -> Index:
+        """
+        Partial index skipping soft deleted rows.
+        Every query filters on ``deleted_at IS NULL``, so the planner
+        can always use it, and unique ones let deleted values be reused.
+        """
+        return Index(
+            name,
+            *columns,
+            postgresql_where=text("deleted_at IS NULL"),
+            **kwargs,
+        )
+
 
 @as_declarative(metadata=meta)
 class Base(CreatedAtMixin, UpdatedAtMixin, DeletedAtMixin):
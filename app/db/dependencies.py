@@ -1,62 +1,103 @@
 import logging
-from asyncio import current_task
 from contextlib import asynccontextmanager
 from functools import lru_cache
+from time import perf_counter
+from typing import Optional
 
+from fastapi import Request, Response
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
-    async_scoped_session,
-    create_async_engine,
+    async_sessionmaker,
 )
-from sqlalchemy.orm import configure_mappers, sessionmaker
+from sqlalchemy.orm import configure_mappers
 
+from app.db.engine import create_engine
+from app.db.query_stats import record_statement
+from app.db.replicas import get_replica_router
 from app.settings import settings
 
 logging.basicConfig(level=logging.WARNING)
 
 
+READ_PRIMARY_COOKIE = "read_primary"
+READ_PRIMARY_HEADER = "X-Read-Primary"
+# Key of Session.info holding the callbacks to run once committed
+AFTER_COMMIT = "after_commit"
+# Key of Session.info set on sessions reading from a replica
+REPLICA = "replica"
+
+
 class DBSession:
-    async def __call__(self):
-        async with self.db_session() as session:
+    def __init__(self, read_only: bool = False):
+        self.read_only = read_only
+
+    async def __call__(self, request: Request, response: Response):
+        if not self.read_only and settings.db_replica_urls:
+            # Lets the client read its own writes while replicas catch up
+            response.set_cookie(
+                READ_PRIMARY_COOKIE,
+                "1",
+                max_age=settings.db_read_your_writes_window,
+                httponly=True,
+            )
+        async with self.db_session(self.get_bind(request)) as session:
             yield session
 
+    @staticmethod
     @lru_cache
-    def get_async_engine(self) -> AsyncEngine:
-        url = str(settings.db_url)
-
-        async_engine = create_async_engine(
-            url,
-            echo=settings.debug,
-            pool_size=settings.db_pool_size,
-            pool_recycle=settings.db_pool_recycle,
-            max_overflow=settings.db_max_overflow,
-        )
+    def get_async_engine() -> AsyncEngine:
+        async_engine = create_engine(str(settings.db_url))
 
         configure_mappers()
         return async_engine
 
+    @lru_cache
+    def get_session_factory(self) -> async_sessionmaker:
+        engine = self.get_async_engine()
+        if self.read_only:
+            # Transactions start as BEGIN READ ONLY, which a hot standby accepts
+            engine = engine.execution_options(postgresql_readonly=True)
+        return async_sessionmaker(engine, expire_on_commit=False)
+
+    def get_bind(self, request: Optional[Request] = None) -> Optional[AsyncEngine]:
+        """Replica serving a read-only session, None for the default engine."""
+        if not self.read_only or not settings.db_replica_urls:
+            return None
+        if request is not None and (
+            request.cookies.get(READ_PRIMARY_COOKIE)
+            or request.headers.get(READ_PRIMARY_HEADER)
+        ):
+            return None
+        return get_replica_router().choose()
+
     @asynccontextmanager
-    async def db_session(self) -> AsyncSession:
-        session_factory = async_scoped_session(
-            sessionmaker(
-                self.get_async_engine(),
-                expire_on_commit=False,
-                class_=AsyncSession,
-            ),
-            scopefunc=current_task,
-        )
-        async_session = session_factory()
+    async def db_session(self, bind: Optional[AsyncEngine] = None) -> AsyncSession:
+        session_factory = self.get_session_factory()
+        async_session = session_factory(bind=bind) if bind else session_factory()
+        async_session.info[REPLICA] = bind is not None
 
         try:
             yield async_session
-            await async_session.commit()
+            # Read only sessions skip the COMMIT, close() just ends the transaction
+            if not self.read_only:
+                # The cursor events count the flush, the COMMIT goes around
+                # them. Sessions that never reached the database skip both
+                if async_session.new or async_session.dirty or async_session.deleted:
+                    await async_session.flush()
+                if async_session.in_transaction():
+                    start = perf_counter()
+                    await async_session.commit()
+                    record_statement(perf_counter() - start)
         except Exception as err:
             logging.warning(f"Session rollback because of exception: {err}")
             await async_session.rollback()
             raise
         finally:
             await async_session.close()
+        for callback in async_session.info.pop(AFTER_COMMIT, []):
+            await callback()
 
 
 db_session = DBSession()
+read_only_db_session = DBSession(read_only=True)
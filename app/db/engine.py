@@ -0,0 +1,108 @@
+from typing import Container, Optional
+from uuid import uuid4
+
+from prometheus_client import Counter
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db import query_stats
+from app.db.pool import instrumented_pool_class
+from app.settings import settings
+from app.tracing import instrument_engine
+
+
+COMPILED_CACHE = Counter(
+    "db_compiled_cache_requests_total",
+    "SQLAlchemy compiled query cache lookups by outcome",
+    ["result"],
+)
+COMPILED_CACHE_HITS = COMPILED_CACHE.labels("hit")
+COMPILED_CACHE_MISSES = COMPILED_CACHE.labels("miss")
+PREPARED_STATEMENT_CACHE = Counter(
+    "db_prepared_statement_cache_requests_total",
+    "asyncpg prepared statement cache lookups by outcome",
+    ["result"],
+)
+PREPARED_STATEMENT_CACHE_HITS = PREPARED_STATEMENT_CACHE.labels("hit")
+PREPARED_STATEMENT_CACHE_MISSES = PREPARED_STATEMENT_CACHE.labels("miss")
+
+
+def count_statement_cache(conn, cursor, statement, parameters, context, executemany):
+    if context.cache_hit is CacheStats.CACHE_HIT:
+        COMPILED_CACHE_HITS.inc()
+    elif context.cache_hit is CacheStats.CACHE_MISS:
+        COMPILED_CACHE_MISSES.inc()
+
+    prepared = _prepared_statement_cache(conn.connection.dbapi_connection)
+    if prepared is None or executemany:
+        return
+    if statement in prepared:
+        PREPARED_STATEMENT_CACHE_HITS.inc()
+    else:
+        PREPARED_STATEMENT_CACHE_MISSES.inc()
+
+
+def create_engine(url, name: str = "primary", **kwargs) -> AsyncEngine:
+    """
+    Create an async engine configured from settings.
+    :param url: database URL.
+    :param name: name of the engine's pool in the metrics.
+    :param kwargs: extra arguments for create_async_engine.
+    :return: engine counting its statement cache hits and pool usage.
+    """
+    options = {
+        "echo": settings.debug,
+        "query_cache_size": settings.db_query_cache_size,
+    }
+    if settings.db_pgbouncer:
+        # PgBouncer in transaction mode hands each transaction a different
+        # server connection, so no prepared statement can be reused by name.
+        options["poolclass"] = NullPool
+        options["connect_args"] = {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    else:
+        options.update(
+            poolclass=instrumented_pool_class(name),
+            pool_size=settings.db_pool_size,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            max_overflow=settings.db_max_overflow,
+            connect_args={
+                "prepared_statement_cache_size": (
+                    settings.db_prepared_statement_cache_size
+                ),
+            },
+        )
+    options.update(kwargs)
+
+    async_engine = create_async_engine(url, **options)
+    instrument_engine(async_engine)
+    event.listen(
+        async_engine.sync_engine,
+        "before_cursor_execute",
+        query_stats.before_cursor_execute,
+    )
+    event.listen(
+        async_engine.sync_engine,
+        "after_cursor_execute",
+        query_stats.after_cursor_execute,
+    )
+    event.listen(
+        async_engine.sync_engine,
+        "before_cursor_execute",
+        count_statement_cache,
+    )
+    return async_engine
+
+
+def _prepared_statement_cache(dbapi_connection) -> Optional[Container]:
+    # Per connection LRU of the asyncpg adapter, private to SQLAlchemy: None
+    # when disabled, or when a release drops or reshapes it, which stops the
+    # counting instead of failing statements
+    cache = getattr(dbapi_connection, "_prepared_statement_cache", None)
+    return cache if isinstance(cache, Container) else None
@@ -0,0 +1,79 @@
+import logging
+from time import perf_counter
+from typing import Type
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.settings import settings
+
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Wait for a pool connection, by pool",
+    ["pool"],
+    buckets=CHECKOUT_BUCKETS,
+)
+POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Pool connections checked out, by pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_connections_overflow",
+    "Pool connections open beyond the pool size, by pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts failed waiting for a pool connection, by pool",
+    ["pool"],
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool timing every checkout, including the wait for a free slot.
+
+    The in use and overflow gauges are set on each checkout and return, the
+    metrics are labelled with the engine's pool name.
+    """
+
+    pool_name: str
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.labels(self.pool_name).inc()
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            POOL_CHECKOUT_DURATION.labels(self.pool_name).observe(elapsed)
+            if elapsed >= settings.db_pool_checkout_warning_threshold:
+                logging.warning(
+                    f"Waited {elapsed:.3f}s for a connection of pool "
+                    f"{self.pool_name} ({self.status()})"
+                )
+        self._set_gauges()
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._set_gauges()
+
+    def _set_gauges(self) -> None:
+        POOL_IN_USE.labels(self.pool_name).set(self.checkedout())
+        POOL_OVERFLOW.labels(self.pool_name).set(max(self.overflow(), 0))
+
+
+def instrumented_pool_class(name: str) -> Type[InstrumentedQueuePool]:
+    return type(
+        "InstrumentedQueuePool",
+        (InstrumentedQueuePool,),
+        {"pool_name": name},
+    )
@@ -0,0 +1,89 @@
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from app.settings import settings
+
+
+class RequestSQLStats:
+    """Statements run while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+request_sql_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar(
+    "request_sql_stats", default=None
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_start = perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context.query_start
+    record_statement(elapsed)
+
+    if elapsed < settings.db_slow_query_threshold:
+        return
+    message = (
+        f"Slow query took {elapsed:.3f}s with parameters "
+        f"{parameter_shape(parameters)}: {statement}"
+    )
+    if settings.db_slow_query_explain and _is_select(statement):
+        message += f"\n{_explain(conn, statement, parameters)}"
+    logging.warning(message)
+
+
+def record_statement(elapsed: float) -> None:
+    """Count a statement in the current request, if any."""
+    stats = request_sql_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+
+
+def parameter_shape(parameters) -> str:
+    """Types and sizes of bound parameters, never their values."""
+    if isinstance(parameters, list):
+        first = parameter_shape(parameters[0]) if parameters else ""
+        return f"{len(parameters)} x {first}"
+    if isinstance(parameters, dict):
+        shapes = ", ".join(
+            f"{name}: {_value_shape(value)}" for name, value in parameters.items()
+        )
+        return f"{{{shapes}}}"
+    if isinstance(parameters, tuple):
+        return f"({', '.join(_value_shape(value) for value in parameters)})"
+    return _value_shape(parameters)
+
+
+def _value_shape(value) -> str:
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def _is_select(statement: str) -> bool:
+    # EXPLAIN ANALYZE runs the statement again, only plain reads are safe
+    return statement.lstrip().upper().startswith("SELECT")
+
+
+def _explain(conn, statement, parameters) -> str:
+    # A raw DBAPI cursor, so the EXPLAIN does not go through these events,
+    # inside a savepoint, so a failure does not abort the transaction
+    cursor = conn.connection.dbapi_connection.cursor()
+    cursor.execute("SAVEPOINT slow_query_explain")
+    try:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception as err:
+        cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        return f"EXPLAIN failed: {err}"
+    finally:
+        cursor.close()
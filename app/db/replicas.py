@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from functools import lru_cache
+from itertools import count
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.engine import create_engine
+from app.settings import settings
+
+
+class ReplicaRouter:
+    """Picks a healthy read replica for read-only sessions."""
+
+    def __init__(
+        self,
+        engines: List[AsyncEngine],
+        strategy: str = "round_robin",
+        health_check_interval: float = 5,
+    ):
+        self.engines = engines
+        self.strategy = strategy
+        self.health_check_interval = health_check_interval
+        self.healthy = {engine: True for engine in engines}
+        self._turn = count()
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Replica for the next read, or None to fall back to the primary."""
+        engines = [engine for engine in self.engines if self.healthy[engine]]
+        if not engines:
+            return None
+        if self.strategy == "least_busy":
+            return min(engines, key=lambda engine: engine.sync_engine.pool.checkedout())
+        return engines[next(self._turn) % len(engines)]
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self._check(engine) for engine in self.engines))
+
+    async def run_health_checks(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_check_interval)
+
+    async def dispose(self) -> None:
+        await asyncio.gather(*(engine.dispose() for engine in self.engines))
+
+    async def _check(self, engine: AsyncEngine) -> None:
+        try:
+            async with engine.connect() as connection:
+                await asyncio.wait_for(
+                    connection.execute(text("SELECT 1")),
+                    timeout=self.health_check_interval,
+                )
+            healthy = True
+        except Exception as err:
+            healthy = False
+            if self.healthy[engine]:
+                logging.warning(f"Replica {engine.url!r} is unhealthy: {err}")
+        if healthy and not self.healthy[engine]:
+            logging.warning(f"Replica {engine.url!r} is healthy again")
+        self.healthy[engine] = healthy
+
+
+@lru_cache
+def get_replica_router() -> ReplicaRouter:
+    engines = [
+        create_engine(
+            make_url(url).set(drivername="postgresql+asyncpg"),
+            name=f"replica-{index}",
+            execution_options={"postgresql_readonly": True},
+        )
+        for index, url in enumerate(settings.db_replica_urls)
+    ]
+    return ReplicaRouter(
+        engines,
+        strategy=settings.db_replica_strategy,
+        health_check_interval=settings.db_replica_health_check_interval,
+    )
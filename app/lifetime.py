@@ -1,8 +1,14 @@
+import asyncio
+import os
 from typing import Awaitable, Callable
 
 from fastapi import FastAPI
+from prometheus_client import multiprocess
 
-from app.db.dependencies import DBSession
+from app.cache import get_product_cache
+from app.db.dependencies import db_session
+from app.db.replicas import get_replica_router
+from app.tracing import shutdown_tracing
 
 
 def startup(app: FastAPI) -> Callable[[], Awaitable[None]]:
@@ -15,7 +21,13 @@ def startup(app: FastAPI) -> Callable[[], Awaitable[None]]:
     """
 
     async def _startup() -> None:
-        app.state.db_engine = DBSession().get_async_engine()
+        app.state.db_engine = db_session.get_async_engine()
+        app.state.replica_health_checks = None
+        replica_router = get_replica_router()
+        if replica_router.engines:
+            app.state.replica_health_checks = asyncio.create_task(
+                replica_router.run_health_checks()
+            )
 
     return _startup
 
@@ -28,6 +40,13 @@ def shutdown(app: FastAPI) -> Callable[[], Awaitable[None]]:
     """
 
     async def _shutdown() -> None:
+        if app.state.replica_health_checks is not None:
+            app.state.replica_health_checks.cancel()
+        await get_replica_router().dispose()
         await app.state.db_engine.dispose()
+        await get_product_cache().close()
+        shutdown_tracing()
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            multiprocess.mark_process_dead(os.getpid())
 
     return _shutdown
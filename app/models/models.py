@@ -1,17 +1,38 @@
-from sqlalchemy import DECIMAL, TEXT, Column, Integer, String, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import DECIMAL, TEXT, Column, Computed, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred
 
-from app.db.base import Base
+from app.db.base import Base, DeletedAtMixin
+
+PRODUCT_SEARCH_CONFIG = "simple"
 
 
 class Product(Base):
     __tablename__ = "product"
-    __table_args__ = ()
+    # The pg_trgm GIN indexes backing the name/description ilike filters
+    # depend on the extension and are managed by migration 8b1e4f7a9c20.
+    __table_args__ = (
+        DeletedAtMixin.active_index("ix_product_name_active", "name", unique=True),
+        DeletedAtMixin.active_index(
+            "ix_product_created_at_product_id_active", "created_at", "product_id"
+        ),
+        Index("ix_product_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     product_id = Column(
         UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()")
     )
-    name = Column(String(256), nullable=False, unique=True)
+    name = Column(String(256), nullable=False)
     description = Column(TEXT, nullable=False)
     value = Column(DECIMAL(precision=10, scale=2), nullable=False)
     quantity = Column(Integer, nullable=False)
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                f"setweight(to_tsvector('{PRODUCT_SEARCH_CONFIG}', name), 'A') || "
+                f"setweight(to_tsvector('{PRODUCT_SEARCH_CONFIG}', description), 'B')",
+                persisted=True,
+            ),
+        )
+    )
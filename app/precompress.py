@@ -0,0 +1,43 @@
+"""
+Build step compressing the static files.
+
+Writes the ``.br`` and ``.gz`` siblings served by
+``app.compression.PrecompressedStaticFiles``. It runs at build time,
+before any configuration exists, so nothing here reads the settings:
+``python -m app.precompress app/static``.
+"""
+import gzip
+import os
+import sys
+
+# Siblings written for each coding
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+
+def precompress(directory: str) -> None:
+    """
+    Write the ``.br`` and ``.gz`` siblings of the static files.
+    Brotli is skipped when the library is missing.
+    :param directory: root of the static files.
+    """
+    try:
+        import brotli  # noqa: WPS433
+    except ImportError:
+        brotli = None
+
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(tuple(PRECOMPRESSED.values())):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as source:
+                data = source.read()
+            with open(f"{path}.gz", "wb") as target:
+                target.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(f"{path}.br", "wb") as target:
+                    target.write(brotli.compress(data, quality=11))
+
+
+if __name__ == "__main__":
+    precompress(sys.argv[1] if len(sys.argv) > 1 else "app/static")
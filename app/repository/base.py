@@ -1,16 +1,54 @@
 import logging
+from datetime import datetime
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from fastapi_pagination.ext.async_sqlalchemy import paginate
-from sqlalchemy import and_, func, select, update
+from fastapi_pagination.api import create_page
+from fastapi_pagination.bases import AbstractPage
+from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi_pagination.utils import verify_params
+from sqlalchemy import (
+    and_,
+    any_,
+    column,
+    func,
+    literal,
+    select,
+    text,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.exc import IntegrityError, NoResultFound
-from sqlalchemy.ext.asyncio import AsyncScalarResult, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.elements import BinaryExpression
+from sqlalchemy.sql.selectable import CTE
 from starlette import status
 
 from app.api.helpers.exception import HTTPError, IntegrityException
+from app.api.helpers.pagination import (
+    CountStrategy,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+)
 from app.db.base import Base
+from app.db.dependencies import AFTER_COMMIT, REPLICA
+from app.db.expressions import Explain
+from app.settings import settings
+from app.tracing import traced_methods
 
 
+@traced_methods
 class BaseRepository:
     """Class for accessing model table."""
 
@@ -20,6 +58,19 @@ class BaseRepository:
         logging.basicConfig(level=logging.WARNING)
         self.logger = logging.getLogger(__name__)
 
+    @property
+    def reads_replica(self) -> bool:
+        """Whether the session reads from a replica, possibly behind."""
+        return self.session.info.get(REPLICA, False)
+
+    def after_commit(self, callback: Callable[[], Awaitable]) -> None:
+        """Run a callback once the transaction of the session is committed.
+        Sessions from ``DBSession`` run them after their COMMIT, a rollback
+        drops them.
+        :param callback: coroutine function called without arguments.
+        """
+        self.session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
     async def create(self, base_model: Base) -> Base:
         """Add single model to database.
         :param base_model: model.
@@ -34,28 +85,240 @@ class BaseRepository:
             await self.session.rollback()
             raise IntegrityException(f"{self.model.__name__} integrity error")
 
+    async def create_many(
+        self,
+        data: List[dict],
+        conflict_columns: Sequence[str] = (),
+    ) -> List[Base]:
+        """Add many models to database with multi-row INSERT ... RETURNING.
+        Rows conflicting on ``conflict_columns`` are skipped instead of
+        aborting the whole batch.
+        :param data: list of dicts with the data of each model.
+        :param conflict_columns: columns of the unique index among models not
+            deleted to skip on.
+        :return: the models actually inserted.
+        """
+        query = insert(self.model)
+        if conflict_columns:
+            query = query.on_conflict_do_nothing(
+                index_elements=conflict_columns,
+                index_where=self.model.deleted_at.is_(None),
+            )
+
+        try:
+            result_query = await self.session.scalars(
+                query.returning(self.model),
+                data,
+            )
+            return result_query.all()
+        except IntegrityError:
+            await self.session.rollback()
+            raise IntegrityException(f"{self.model.__name__} integrity error")
+
+    async def upsert_with_copy(
+        self,
+        records: List[tuple],
+        columns: Sequence[str],
+        conflict_column: str,
+    ) -> Tuple[int, list]:
+        """Load records through COPY into a staging table and upsert them.
+        The staging table lives until the end of the transaction.
+        :param records: tuples with the values of ``columns``.
+        :param columns: columns filled by the records.
+        :param conflict_column: column unique among models not deleted,
+            matching existing models.
+        :return: count of models inserted, and the ids of those updated.
+        """
+        table = self.model.__tablename__
+        model_id = f"{table}_id"
+        staging = f"{table}_staging"
+        column_list = ", ".join(columns)
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in columns
+            if column != conflict_column
+        )
+
+        # Goes through the session first so the driver transaction is open
+        # before COPY runs on the raw asyncpg connection.
+        await self.session.execute(
+            text(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP "
+                f"AS SELECT {column_list} FROM {table} WITH NO DATA"
+            )
+        )
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            staging,
+            records=records,
+            columns=list(columns),
+        )
+        result_query = await self.session.execute(
+            text(
+                f"WITH upserted AS ("
+                f"INSERT INTO {table} ({column_list}) "
+                f"SELECT {column_list} FROM {staging} "
+                f"ON CONFLICT ({conflict_column}) WHERE deleted_at IS NULL "
+                f"DO UPDATE SET {updates}, updated_at = clock_timestamp() "
+                f"RETURNING {model_id}, xmax = 0 AS inserted) "
+                f"SELECT count(*) FILTER (WHERE inserted), "
+                f"coalesce(array_agg({model_id}) FILTER (WHERE NOT inserted), "
+                f"'{{}}') FROM upserted"
+            )
+        )
+        await self.session.execute(text(f"TRUNCATE {staging}"))
+        inserted, updated_ids = result_query.one()
+        return inserted, updated_ids
+
     async def get_all(
         self,
         query_filter=None,
-    ) -> AsyncScalarResult:
+        order_by=None,
+        count_strategy: CountStrategy = CountStrategy.exact,
+        total: Optional[int] = None,
+        columns: Optional[Sequence] = None,
+    ) -> AbstractPage:
         """Get all models.
         :param query_filter: filters for query.
+        :param order_by: ordering clauses for query.
+        :param count_strategy: how the total of models is computed.
+        :param total: total already known, skipping the count.
+        :param columns: columns to select instead of the whole model.
+        :return: page of models, or rows when columns are given.
+        """
+        query = select(*columns) if columns else select(self.model)
+        if query_filter is not None:
+            query = query.filter(query_filter)
+        if order_by is not None:
+            query = query.order_by(*order_by)
+
+        additional_data = {"count_strategy": count_strategy}
+        if total is None and count_strategy in {
+            CountStrategy.exact,
+            CountStrategy.cached,
+        }:
+            return await paginate(
+                self.session,
+                query,
+                additional_data=additional_data,
+                # A single column would otherwise come back as bare values
+                unwrap_mode="no-unwrap" if columns else None,
+            )
+
+        if count_strategy == CountStrategy.estimated:
+            total = await self.estimate_count(query_filter)
+        params, raw_params = verify_params(None, "limit-offset")
+        result_query = await self.session.execute(
+            query.limit(raw_params.limit).offset(raw_params.offset)
+        )
+        if not columns:
+            result_query = result_query.scalars()
+        return create_page(
+            result_query.all(),
+            total=total,
+            params=params,
+            **additional_data,
+        )
+
+    async def estimate_count(self, query_filter=None) -> int:
+        """Estimate the count of models from the planner statistics.
+        Reads the row estimate of EXPLAIN, which unlike
+        ``pg_class.reltuples`` leaves soft deleted models out.
+        :param query_filter: filters for query.
+        :return: estimated count of models.
+        """
+        query = select(self.model)
+        if query_filter is not None:
+            query = query.filter(query_filter)
+        plan = await self.session.scalar(Explain(query))
+        return plan[0]["Plan"]["Plan Rows"]
+
+    async def fingerprint(self, query_filter=None) -> Tuple[int, Optional[datetime]]:
+        """Count models and find their latest update in one aggregate.
+        Any creation, update or deletion among them changes the pair.
+        :param query_filter: filters for query.
+        :return: count of models and the latest ``updated_at``.
+        """
+        query = select(func.count(), func.max(self.model.updated_at))
+        if query_filter is not None:
+            query = query.filter(query_filter)
+        result_query = await self.session.execute(query)
+        return tuple(result_query.one())
+
+    async def get_all_by_cursor(
+        self,
+        query_filter=None,
+    ) -> AbstractPage:
+        """Get all models using keyset pagination.
+        Models are ordered by (created_at, id) and the cursor holds the
+        last pair returned, so no OFFSET is scanned and no total is counted.
+        :param query_filter: filters for query.
         :return: models.
         """
+        params, raw_params = verify_params(None, "cursor")
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+
         query = select(self.model)
         if query_filter is not None:
             query = query.filter(query_filter)
-        return await paginate(self.session, query)
+        if raw_params.cursor:
+            created_at, last_id = decode_keyset_cursor(raw_params.cursor)
+            query = query.where(
+                tuple_(self.model.created_at, model_id) > tuple_(created_at, last_id)
+            )
+        query = query.order_by(self.model.created_at, model_id).limit(
+            raw_params.size + 1
+        )
+
+        result_query = await self.session.execute(query)
+        items = result_query.scalars().all()
+
+        next_cursor = None
+        if len(items) > raw_params.size:
+            items = items[: raw_params.size]
+            next_cursor = encode_keyset_cursor(
+                items[-1].created_at, getattr(items[-1], model_id.key)
+            )
+        return create_page(items, params=params, next_=next_cursor)
+
+    async def stream_all(
+        self,
+        query_filter=None,
+        columns: Optional[Sequence] = None,
+    ) -> AsyncIterator:
+        """Stream all models through a server-side cursor.
+        Rows are fetched ``settings.db_stream_batch_size`` at a time, so
+        memory stays flat regardless of the size of the table.
+        :param query_filter: filters for query.
+        :param columns: columns to select instead of the whole model.
+        :return: async iterator of models, or rows when columns are given.
+        """
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        query = select(*columns) if columns else select(self.model)
+        if query_filter is not None:
+            query = query.filter(query_filter)
+        query = query.order_by(self.model.created_at, model_id).execution_options(
+            yield_per=settings.db_stream_batch_size
+        )
 
-    async def get_by_id(self, id: str) -> Base:
+        result = await self.session.stream(query)
+        if not columns:
+            result = result.scalars()
+        async for row in result:
+            yield row
+
+    async def get_by_id(self, id: str, columns: Optional[Sequence] = None) -> Base:
         """
         Get a model by id.
         :param id: id of model.
-        :return: a model.
+        :param columns: columns to select instead of the whole model.
+        :return: a model, or a row when columns are given.
         """
         model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        query = select(*columns) if columns else select(self.model)
         result_query = await self.session.execute(
-            select(self.model).where(
+            query.where(
                 and_(
                     model_id == id,
                     self.model.deleted_at.is_(None),
@@ -64,7 +327,7 @@ class BaseRepository:
         )
 
         try:
-            return result_query.scalar_one()
+            return result_query.one() if columns else result_query.scalar_one()
         except NoResultFound:
             raise NoResultFound(f"{self.model.__name__} not found")
 
@@ -88,44 +351,233 @@ class BaseRepository:
                 raise NoResultFound(f"{self.model.__name__} not found")
             return result_query.rowcount
         except IntegrityError as error:
-            status_code = (
-                status.HTTP_409_CONFLICT
-                if "duplicate key" in error.args[0]
-                else status.HTTP_422_UNPROCESSABLE_ENTITY
-            )
-            raise HTTPError(
-                status_code=status_code,
-                error_message=f"{error.args[0].split('DETAIL')[-1]}",
+            raise self._integrity_http_error(error)
+
+    async def update_by_id(
+        self,
+        id,
+        data_to_update,
+        versions: Optional[Sequence[datetime]] = None,
+    ):
+        """Update a model by id.
+        :param id: id of model.
+        :param data_to_update: dict with new data to update a model.
+        :param versions: ``updated_at`` values the model must still have.
+        :raises NoResultFound: if not found or at none of ``versions``
+        """
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        query_filter = and_(
+            model_id == id,
+            self.model.deleted_at.is_(None),
+        )
+        if versions is not None:
+            query_filter = and_(query_filter, self.model.updated_at.in_(versions))
+        await self.update(query_filter, data_to_update)
+
+    async def update_many_by_id(self, data: List[dict]) -> list:
+        """Update many models by id with UPDATE ... FROM (VALUES ...).
+        Each statement carries ``settings.db_bulk_chunk_size`` models and
+        columns an item leaves out keep their current value. Models are
+        updated and locked in id order, so concurrent batches over the same
+        models wait for each other instead of deadlocking.
+        :param data: list of dicts with the id and the new data of each model.
+        :return: ids of the models updated.
+        """
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        columns = sorted({name for item in data for name in item} - {model_id.key})
+        table_columns = [model_id.key, *columns]
+        data = sorted(data, key=lambda item: item[model_id.key])
+        updated_ids = []
+
+        chunk_size = settings.db_bulk_chunk_size
+        for start in range(0, len(data), chunk_size):
+            end = start + chunk_size
+            chunk = data[start:end]
+            data_table = values(
+                *(
+                    column(name, self.model.__table__.c[name].type)
+                    for name in table_columns
+                ),
+                name="data",
+            ).data([tuple(item.get(name) for name in table_columns) for item in chunk])
+            locked = self._lock_in_id_order(item[model_id.key] for item in chunk)
+            query = (
+                update(self.model)
+                .where(
+                    model_id == data_table.c[model_id.key],
+                    model_id == locked.c[model_id.key],
+                    self.model.deleted_at.is_(None),
+                )
+                .values(
+                    {
+                        name: func.coalesce(
+                            data_table.c[name], getattr(self.model, name)
+                        )
+                        for name in columns
+                    }
+                )
+                .returning(model_id)
             )
+            try:
+                result_query = await self.session.execute(query)
+            except IntegrityError as error:
+                raise self._integrity_http_error(error)
+            updated_ids += result_query.scalars().all()
+        return updated_ids
 
-    async def update_by_id(self, id, data_to_update):
+    async def decrement_by_id(
+        self,
+        id,
+        column_name: str,
+        amount: int,
+    ) -> Optional[int]:
+        """Take ``amount`` from a column in one conditional UPDATE.
+        The row lock taken by the UPDATE serializes concurrent callers, so
+        the column never goes below zero and no update is lost.
+        :param id: id of model.
+        :param column_name: column to decrement.
+        :param amount: how much to take.
+        :return: the new value, or None if not found or not enough left.
+        """
         model_id = getattr(self.model, f"{self.model.__tablename__}_id")
-        await self.update(
-            and_(
+        column_to_update = getattr(self.model, column_name)
+        result_query = await self.session.execute(
+            update(self.model)
+            .where(
                 model_id == id,
+                column_to_update >= amount,
                 self.model.deleted_at.is_(None),
-            ),
-            data_to_update,
+            )
+            .values({column_name: column_to_update - amount})
+            .returning(column_to_update)
         )
+        return result_query.scalar_one_or_none()
 
-    async def _soft_delete(
+    async def decrement_many_by_id(
         self,
-        query_filter,
-        data_to_update: dict,
-    ) -> int:
-        query = select(self.model.deleted_at).where(query_filter)
-        result = await self.session.execute(query)
-        if result.scalar_one():
-            return 1
-        return await self.update(
-            query_filter,
-            data_to_update,
+        amounts: Dict,
+        column_name: str,
+    ) -> Tuple[Dict, list]:
+        """Take amounts from a column of many models, all or nothing.
+        Runs one UPDATE ... FROM (VALUES ...) that only applies when every
+        model, locked first in id order, has enough left. Concurrent batches
+        over the same models wait for each other instead of deadlocking.
+        :param amounts: how much to take, by id of model.
+        :param column_name: column to decrement.
+        :return: new values by id, and the ids that could not be decremented.
+        """
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        column_to_update = getattr(self.model, column_name)
+        data = select(
+            values(
+                column("id", model_id.type),
+                column("amount", column_to_update.type),
+                name="amounts",
+            ).data(list(amounts.items()))
+        ).cte("data")
+        locked = self._lock_in_id_order(amounts, column_to_update)
+        enough = (
+            select(func.count())
+            .select_from(locked.join(data, locked.c[model_id.key] == data.c.id))
+            .where(locked.c[column_name] >= data.c.amount)
+            .scalar_subquery()
+        )
+        result_query = await self.session.execute(
+            update(self.model)
+            .where(
+                model_id == data.c.id,
+                enough == len(amounts),
+                self.model.deleted_at.is_(None),
+            )
+            .values({column_name: column_to_update - data.c.amount})
+            .returning(model_id, column_to_update)
+        )
+        decremented = dict(result_query.all())
+        if decremented:
+            return decremented, []
+
+        # Only the failure path pays for telling which models fell short
+        result_query = await self.session.execute(
+            select(model_id, column_to_update).where(
+                model_id == any_(literal(list(amounts), ARRAY(model_id.type))),
+                self.model.deleted_at.is_(None),
+            )
+        )
+        left = dict(result_query.all())
+        return {}, [id for id in amounts if left.get(id, -1) < amounts[id]]
+
+    def _lock_in_id_order(self, ids: Iterable, *columns) -> CTE:
+        """Lock the models of ``ids`` in id order, in a CTE of a statement.
+        Whatever order the plan of the statement visits the rows in, it
+        only reaches rows already locked here, so concurrent statements over
+        the same models queue on the first one instead of deadlocking.
+        :param ids: ids of the models.
+        :param columns: columns to read from the locked models.
+        :return: CTE with the id and ``columns`` of the models found.
+        """
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        return (
+            select(model_id, *columns)
+            .where(
+                model_id == any_(literal(list(ids), ARRAY(model_id.type))),
+                self.model.deleted_at.is_(None),
+            )
+            .order_by(model_id)
+            .with_for_update()
+            .cte("locked")
+            .prefix_with("MATERIALIZED")
         )
 
+    @staticmethod
+    def _integrity_http_error(error: IntegrityError) -> HTTPError:
+        status_code = (
+            status.HTTP_409_CONFLICT
+            if "duplicate key" in error.args[0]
+            else status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        return HTTPError(
+            status_code=status_code,
+            error_message=f"{error.args[0].split('DETAIL')[-1]}",
+        )
+
+    async def soft_delete_many_by_id(self, ids: Sequence) -> Tuple[list, list]:
+        """Soft delete models by id in a single statement.
+        Models already deleted keep their deleted_at.
+        :param ids: ids of models.
+        :return: ids of the models this call deleted, and of those found
+            already deleted.
+        """
+        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
+        found = (
+            select(model_id, self.model.deleted_at)
+            .where(model_id == any_(literal(list(ids), ARRAY(model_id.type))))
+            .cte("found")
+        )
+        deleted = (
+            update(self.model)
+            .where(
+                model_id == found.c[model_id.key],
+                self.model.deleted_at.is_(None),
+            )
+            .values({"deleted_at": func.now()})
+            .returning(model_id)
+            .cte("deleted")
+        )
+        result_query = await self.session.execute(
+            select(deleted.c[model_id.key], literal(True)).union_all(
+                select(found.c[model_id.key], literal(False)).where(
+                    found.c.deleted_at.is_not(None)
+                )
+            )
+        )
+        deleted_ids, already_deleted_ids = [], []
+        for id, deleted_now in result_query.all():
+            (deleted_ids if deleted_now else already_deleted_ids).append(id)
+        return deleted_ids, already_deleted_ids
+
     async def soft_delete_by_id(
         self,
         id: str,
     ) -> None:
-        data_to_update = {"deleted_at": func.now()}
-        model_id = getattr(self.model, f"{self.model.__tablename__}_id")
-        await self._soft_delete((model_id == id), data_to_update)
+        if not any(await self.soft_delete_many_by_id([id])):
+            raise NoResultFound(f"{self.model.__name__} not found")
@@ -1,33 +1,346 @@
+import hashlib
+from datetime import datetime
+from functools import partial
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Tuple
 from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, status
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import NoResultFound
 
-from app.api.product.schemas import ProductCreateSchema, ProductUpdateSchema
+from app.api.helpers.exception import HTTPError
+from app.api.helpers.pagination import CountStrategy
+from app.api.helpers.records import FileFormat, MalformedRecord, encode_rows
+from app.api.helpers.validators import compatible_errors
+from app.api.product.schemas import (
+    ProductBatchConflictSchema,
+    ProductBatchUpdateItemSchema,
+    ProductCacheSchema,
+    ProductCreateSchema,
+    ProductImportErrorSchema,
+    ProductImportSummarySchema,
+    ProductSchema,
+    ProductUpdateSchema,
+    StockDecrementItemSchema,
+    StockDecrementSchema,
+)
+from app.cache import CacheBackend, get_product_cache
+from app.cache.lru import LRUTTLCache
 from app.models.models import Product
-from app.repository.product_repository import ProductRepository
+from app.repository.product_repository import (
+    ProductRepository,
+    ReadOnlyProductRepository,
+)
+from app.settings import settings
+from app.tracing import traced_methods
 
+IMPORT_COLUMNS = ("name", "description", "value", "quantity")
 
+# Listing totals for ?count=cached, per worker: each one may lag the others
+# by up to PRODUCT_COUNT_CACHE_TTL, which the option already accepts
+product_counts = LRUTTLCache(
+    max_size=settings.product_count_cache_size, ttl=settings.product_count_cache_ttl
+)
+
+
+@traced_methods
 class ProductService:
     def __init__(
         self,
         product_repository: ProductRepository = Depends(),
+        product_cache: CacheBackend = Depends(get_product_cache),
     ):  # pragma: no cover
         self.product_repository = product_repository
+        self.product_cache = product_cache
 
     async def create_product(self, payload: ProductCreateSchema):
-        return await self.product_repository.create(Product(**payload.dict()))
+        product = await self.product_repository.create(Product(**payload.model_dump()))
+        await self._invalidate([product.product_id])
+        return product
+
+    async def create_products(self, payload: List[ProductCreateSchema]):
+        created = await self.product_repository.create_many(
+            [product.model_dump() for product in payload],
+            conflict_columns=["name"],
+        )
+
+        created_by_name = {product.name: product for product in created}
+        created_in_order, conflicts = [], []
+        for index, product in enumerate(payload):
+            if product.name in created_by_name:
+                created_in_order.append(created_by_name.pop(product.name))
+            else:
+                conflicts.append(
+                    ProductBatchConflictSchema(index=index, name=product.name)
+                )
+        return {"created": created_in_order, "conflicts": conflicts}
+
+    async def import_products(
+        self, records: AsyncIterator
+    ) -> ProductImportSummarySchema:
+        summary = ProductImportSummarySchema()
+        chunk = []
+        async for line, record in records:
+            try:
+                if isinstance(record, MalformedRecord):
+                    raise record
+                chunk.append(ProductCreateSchema.model_validate(record))
+            except (MalformedRecord, ValidationError) as error:
+                summary.rejected += 1
+                if len(summary.errors) < settings.product_import_max_errors:
+                    summary.errors.append(
+                        ProductImportErrorSchema(
+                            line=line,
+                            error_message=(
+                                compatible_errors(error.errors())
+                                if isinstance(error, ValidationError)
+                                else str(error)
+                            ),
+                        )
+                    )
+            if len(chunk) == settings.product_import_chunk_size:
+                await self._upsert_chunk(chunk, summary)
+                chunk = []
+        if chunk:
+            await self._upsert_chunk(chunk, summary)
+        return summary
+
+    async def get_all_products(
+        self,
+        query_filter,
+        order_by=None,
+        count_strategy: CountStrategy = CountStrategy.exact,
+        total: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ):
+        columns = self._columns(fields)
+        if count_strategy != CountStrategy.cached:
+            return await self.product_repository.get_all(
+                query_filter=query_filter,
+                order_by=order_by,
+                count_strategy=count_strategy,
+                total=total,
+                columns=columns,
+            )
+
+        count_key = self._count_cache_key(query_filter)
+        total = product_counts.get(count_key)
+        page = await self.product_repository.get_all(
+            query_filter=query_filter,
+            order_by=order_by,
+            count_strategy=count_strategy,
+            total=total,
+            columns=columns,
+        )
+        if total is None:
+            product_counts.set(count_key, page.total)
+        return page
 
-    async def get_all_products(self, query_filter):
-        return await self.product_repository.get_all(query_filter=query_filter)
+    async def get_products_fingerprint(
+        self, query_filter
+    ) -> Tuple[int, Optional[datetime]]:
+        return await self.product_repository.fingerprint(query_filter=query_filter)
 
-    async def get_by_product_id(self, product_id):
-        return await self.product_repository.get_by_id(product_id)
+    async def get_all_products_by_cursor(self, query_filter):
+        return await self.product_repository.get_all_by_cursor(
+            query_filter=query_filter
+        )
+
+    def export_products(
+        self, query_filter, file_format: FileFormat
+    ) -> AsyncIterator[str]:
+        fields = list(ProductSchema.model_fields)
+        rows = self.product_repository.stream_all(
+            query_filter=query_filter,
+            columns=[getattr(Product, field) for field in fields],
+        )
+        return encode_rows(rows, fields, file_format)
+
+    async def get_by_product_id(
+        self, product_id, fields: Optional[Sequence[str]] = None
+    ):
+        cache_key = self._cache_key(product_id)
+        cached_product = await self.product_cache.get(cache_key)
+        if cached_product is not None:
+            return ProductCacheSchema.model_validate_json(cached_product)
+
+        if fields is not None:
+            # A partial row cannot fill the cache, the version still comes
+            # along for the validators of the response
+            return await self.product_repository.get_by_id(
+                product_id,
+                columns=self._columns(
+                    dict.fromkeys([*fields, "product_id", "updated_at"])
+                ),
+            )
+
+        product = await self.product_repository.get_by_id(product_id)
+        # What a lagging replica returns could undo an invalidation in the
+        # shared cache, even for the client that just wrote
+        if not self.product_repository.reads_replica:
+            await self.product_cache.set(
+                cache_key, ProductCacheSchema.model_validate(product).model_dump_json()
+            )
+        return product
 
     async def update_by_product_id(
-        self, product_id: UUID, payload: ProductUpdateSchema
+        self,
+        product_id: UUID,
+        payload: ProductUpdateSchema,
+        versions: Optional[List[datetime]] = None,
     ):
-        updated_data = payload.dict(exclude_unset=True)
-        return await self.product_repository.update_by_id(product_id, updated_data)
+        updated_data = payload.model_dump(exclude_unset=True)
+        try:
+            result = await self.product_repository.update_by_id(
+                product_id, updated_data, versions=versions
+            )
+        except NoResultFound:
+            if versions is None:
+                raise
+            # Only the failure path pays for telling 404 from 412 apart.
+            await self.product_repository.get_by_id(product_id)
+            raise HTTPError(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                error_message="Product was modified",
+            )
+        await self._invalidate([product_id])
+        return result
+
+    async def update_products(self, payload: List[ProductBatchUpdateItemSchema]):
+        # Items repeating a product_id are merged, later fields winning.
+        updated_data = {}
+        for product in payload:
+            updated_data.setdefault(product.product_id, {}).update(
+                product.model_dump(exclude_unset=True, exclude_none=True)
+            )
+
+        updated_ids = await self.product_repository.update_many_by_id(
+            list(updated_data.values())
+        )
+        await self._invalidate(updated_ids)
+        missing_ids = set(updated_data) - set(updated_ids)
+        return {
+            "updated": updated_ids,
+            "missing": [id for id in updated_data if id in missing_ids],
+        }
+
+    async def decrement_stock(self, product_id: UUID, payload: StockDecrementSchema):
+        quantity = await self.product_repository.decrement_by_id(
+            product_id, "quantity", payload.quantity
+        )
+        if quantity is None:
+            # Only the failure path pays for telling 404 from 409 apart.
+            await self.product_repository.get_by_id(product_id)
+            raise HTTPError(
+                status_code=status.HTTP_409_CONFLICT,
+                error_message="Insufficient stock",
+            )
+
+        await self._invalidate([product_id])
+        return {"product_id": product_id, "quantity": quantity}
+
+    async def decrement_stocks(self, payload: List[StockDecrementItemSchema]):
+        amounts = {}
+        for item in payload:
+            amounts[item.product_id] = amounts.get(item.product_id, 0) + item.quantity
+
+        quantities, failed_ids = await self.product_repository.decrement_many_by_id(
+            amounts, "quantity"
+        )
+        if failed_ids:
+            raise HTTPError(
+                status_code=status.HTTP_409_CONFLICT,
+                error_message=(
+                    "Insufficient stock or product not found: "
+                    f"{', '.join(str(id) for id in failed_ids)}"
+                ),
+            )
+
+        await self._invalidate(quantities)
+        return [
+            {"product_id": product_id, "quantity": quantity}
+            for product_id, quantity in quantities.items()
+        ]
 
     async def delete_by_product_id(self, product_id: UUID):
-        return await self.product_repository.soft_delete_by_id(id=product_id)
+        result = await self.product_repository.soft_delete_by_id(id=product_id)
+        await self._invalidate([product_id])
+        return result
+
+    async def delete_products(self, product_ids: List[UUID]):
+        if len(product_ids) > settings.product_batch_max_size:
+            raise HTTPError(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                error_message=(
+                    f"At most {settings.product_batch_max_size} ids per request"
+                ),
+            )
+
+        product_ids = list(dict.fromkeys(product_ids))
+        result = await self.product_repository.soft_delete_many_by_id(product_ids)
+        deleted_ids, already_deleted_ids = result
+        await self._invalidate(deleted_ids)
+        deleted_ids = {*deleted_ids, *already_deleted_ids}
+        return {
+            "deleted": [id for id in product_ids if id in deleted_ids],
+            "missing": [id for id in product_ids if id not in deleted_ids],
+        }
+
+    async def _upsert_chunk(
+        self, chunk: List[ProductCreateSchema], summary: ProductImportSummarySchema
+    ):
+        # The last occurrence of a name wins, as if the records ran in order.
+        records = {
+            product.name: (
+                product.name,
+                product.description,
+                product.value,
+                product.quantity,
+            )
+            for product in chunk
+        }
+        inserted, updated_ids = await self.product_repository.upsert_with_copy(
+            list(records.values()),
+            columns=IMPORT_COLUMNS,
+            conflict_column="name",
+        )
+        await self._invalidate(updated_ids)
+        summary.inserted += inserted
+        summary.updated += len(updated_ids) + len(chunk) - len(records)
+
+    async def _invalidate(self, product_ids: Iterable) -> None:
+        keys = [self._cache_key(product_id) for product_id in product_ids]
+        await self.product_cache.delete_many(keys)
+        # And again once committed: until then other sessions still read the
+        # old row, and a miss among them may have cached it meanwhile
+        self.product_repository.after_commit(
+            partial(self.product_cache.delete_many, keys)
+        )
+
+    @staticmethod
+    def _columns(fields: Optional[Iterable[str]]) -> Optional[list]:
+        if fields is None:
+            return None
+        return [getattr(Product, field) for field in fields]
+
+    @staticmethod
+    def _cache_key(product_id) -> str:
+        return f"product:{product_id}"
+
+    @staticmethod
+    def _count_cache_key(query_filter) -> str:
+        fingerprint = ""
+        if query_filter is not None:
+            compiled = query_filter.compile(dialect=postgresql.dialect())
+            fingerprint = f"{compiled}{sorted(compiled.params.items())}"
+        return f"product:count:{hashlib.sha256(fingerprint.encode()).hexdigest()}"
+
+
+class ReadOnlyProductService(ProductService):
+    def __init__(
+        self,
+        product_repository: ReadOnlyProductRepository = Depends(),
+        product_cache: CacheBackend = Depends(get_product_cache),
+    ):  # pragma: no cover
+        super().__init__(product_repository, product_cache)
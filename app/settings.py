@@ -1,13 +1,15 @@
 from pathlib import Path
 from tempfile import gettempdir
+from typing import List, Literal, Optional
 
-import pydantic
+from pydantic import model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from yarl import URL
 
 TEMP_DIR = Path(gettempdir())
 
 
-class Settings(pydantic.BaseSettings):
+class Settings(BaseSettings):
     """Application settings."""
 
     service_name: str = "backend-api"
@@ -17,6 +19,23 @@ class Settings(pydantic.BaseSettings):
 
     jwt_secret_key: str
     algorithm: str
+    # Verified tokens kept until their exp, 0 disables the cache
+    jwt_cache_size: int = 10000
+    # Rejected tokens kept to skip verifying them again, and for how long
+    jwt_negative_cache_size: int = 10000
+    jwt_negative_cache_ttl: int = 60
+
+    # Renderer of JSON responses, orjson or the standard library json
+    json_response_class: str = "orjson"
+    # Serialize product responses as they come, without validating them again
+    json_response_fast_path: bool = True
+
+    # Responses smaller than this go out uncompressed, in bytes
+    compression_minimum_size: int = 1000
+    # Content codings offered, preferred first when the client has no preference
+    compression_encodings: List[str] = ["zstd", "br", "gzip"]
+    # Seconds clients may cache /static files
+    static_cache_max_age: int = 2592000
 
     # quantity of workers for uvicorn
     workers_count: int
@@ -33,9 +52,78 @@ class Settings(pydantic.BaseSettings):
     db_pool_size: int = 5
     db_pool_recycle: int = 30
     db_max_overflow: int = 10
+    # Seconds a checkout waits for a free connection before failing
+    db_pool_timeout: float = 30
+    # Checkout waits logged as a warning, in seconds
+    db_pool_checkout_warning_threshold: float = 0.1
+    # Statements logged as slow, in seconds
+    db_slow_query_threshold: float = 0.5
+    # Log the EXPLAIN (ANALYZE, BUFFERS) of slow SELECTs, running them twice.
+    # Plans show the constants they were built for, parameter values included
+    db_slow_query_explain: bool = False
+    # Requests issuing more statements are logged, usually an N+1
+    db_statements_per_request_warning: int = 50
+    # Add a Server-Timing header with the request's SQL count and time
+    server_timing_enabled: bool = True
+    # Compiled SQL strings kept by SQLAlchemy, per engine
+    db_query_cache_size: int = 500
+    # asyncpg prepared statements kept per connection
+    db_prepared_statement_cache_size: int = 100
+    # Behind PgBouncer in transaction mode: no pool, no named prepares reused
+    db_pgbouncer: bool = False
+    # Rows fetched per round-trip by server-side cursors
+    db_stream_batch_size: int = 1000
+    # Rows per statement for bulk UPDATE ... FROM (VALUES ...)
+    db_bulk_chunk_size: int = 1000
+    # Read replicas serving GET routes, as a JSON list of URLs
+    db_replica_urls: List[str] = []
+    # least_busy reads the pool's checked out connections, so it needs the pool
+    # DB_PGBOUNCER turns off
+    db_replica_strategy: Literal["round_robin", "least_busy"] = "round_robin"
+    db_replica_health_check_interval: float = 5
+    # Seconds a client reads from the primary after a write
+    db_read_your_writes_window: int = 5
+
+    # Max items accepted by the product batch endpoints
+    product_batch_max_size: int = 10000
+    # Records validated and copied per round-trip by the product import
+    product_import_chunk_size: int = 5000
+    product_import_max_errors: int = 1000
+    # Longest line or CSV record kept by the product import, in characters
+    product_import_max_record_size: int = 65536
+    # Seconds a product listing total is reused with ?count=cached, and how
+    # many totals each worker keeps in memory
+    product_count_cache_ttl: int = 60
+    product_count_cache_size: int = 1000
+
+    # Cache for product reads: "redis", "memory" or "none". Unset, Redis when
+    # CACHE_REDIS_URL is given and no cache otherwise. "memory" is per
+    # process, so it is turned off when more than one worker runs
+    cache_backend: Optional[str] = None
+    cache_ttl: int = 300
+    cache_max_size: int = 10000
+    cache_redis_url: Optional[str] = None
+
+    # OpenTelemetry tracing, needs the "tracing" extra
+    otel_enabled: bool = False
+    # "otlp", "console" or "file"
+    otel_exporter: str = "otlp"
+    otel_exporter_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    otel_exporter_file: str = "traces.jsonl"
+    # Fraction of new traces recorded, child spans follow their parent
+    otel_sample_ratio: float = 1.0
 
     debug: bool
 
+    @model_validator(mode="after")
+    def check_replica_strategy(self) -> "Settings":
+        if self.db_pgbouncer and self.db_replica_strategy == "least_busy":
+            raise ValueError(
+                "DB_REPLICA_STRATEGY=least_busy needs a connection pool, "
+                "which DB_PGBOUNCER=True turns off"
+            )
+        return self
+
     @property
     def db_url(self) -> URL:
         """
@@ -66,9 +154,11 @@ class Settings(pydantic.BaseSettings):
             path=f"/{self.db_base}",
         )
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
 
 
 settings = Settings()
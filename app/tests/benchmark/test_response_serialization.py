@@ -0,0 +1,68 @@
+from time import perf_counter
+from uuid import uuid4
+
+import pytest
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse
+
+from app.api.helpers.pagination import CountedPage, CountStrategy
+from app.api.helpers.responses import fast_response
+from app.api.product.schemas import ProductSchema
+
+RENDERS = 500
+PAGE_SIZE = 100
+
+
+def product_page() -> CountedPage[ProductSchema]:
+    return CountedPage[ProductSchema](
+        items=[
+            ProductSchema(
+                product_id=uuid4(),
+                name=f"Product {index}",
+                description="Brief description of the product",
+                value=19.9,
+                quantity=index + 1,
+            )
+            for index in range(PAGE_SIZE)
+        ],
+        total=PAGE_SIZE,
+        page=1,
+        size=PAGE_SIZE,
+        count_strategy=CountStrategy.exact,
+    )
+
+
+async def validated(page, field) -> bytes:
+    # What FastAPI does with the response model and the stdlib renderer
+    content = await serialize_response(
+        field=field, response_content=page, is_coroutine=True
+    )
+    return JSONResponse(content).body
+
+
+async def fast(page, field) -> bytes:
+    return fast_response(page, CountedPage[ProductSchema]).body
+
+
+async def render(serialize, page, field) -> float:
+    start = perf_counter()
+    for _ in range(RENDERS):
+        await serialize(page, field)
+    return (perf_counter() - start) / RENDERS
+
+
+@pytest.mark.asyncio
+async def test_fast_path_serializes_pages_faster():
+    page = product_page()
+    field = create_response_field(name="response", type_=CountedPage[ProductSchema])
+    await render(validated, page, field)
+    await render(fast, page, field)
+
+    before = await render(validated, page, field)
+    after = await render(fast, page, field)
+    print(
+        f"\n{PAGE_SIZE} products page: {before * 1e6:.0f}us validated with json, "
+        f"{after * 1e6:.0f}us on the fast path with orjson ({before / after:.1f}x)"
+    )
+    assert after < before
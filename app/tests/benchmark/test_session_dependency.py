@@ -0,0 +1,69 @@
+from asyncio import current_task
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+import pytest
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession, async_scoped_session
+from sqlalchemy.orm import sessionmaker
+
+from app.db.dependencies import DBSession
+
+REQUESTS = 5000
+ROUNDS = 5
+# The shared factory measured 2.5-3x faster when this was written
+MIN_SPEEDUP = 1.5
+
+
+class ScopedDBSession(DBSession):
+    """Previous dependency: a sessionmaker and a registry per request."""
+
+    @asynccontextmanager
+    async def db_session(self, bind=None) -> AsyncSession:
+        session_factory = async_scoped_session(
+            sessionmaker(
+                self.get_async_engine(),
+                expire_on_commit=False,
+                class_=AsyncSession,
+            ),
+            scopefunc=current_task,
+        )
+        async_session = session_factory()
+        try:
+            yield async_session
+            await async_session.commit()
+        finally:
+            await async_session.close()
+
+
+async def resolve(dependency: DBSession) -> float:
+    request = Request({"type": "http", "headers": []})
+    start = perf_counter()
+    for _ in range(REQUESTS):
+        # Sessions connect lazily, so this only measures the dependency itself
+        async for _ in dependency(request, Response()):
+            pass
+    return (perf_counter() - start) / REQUESTS
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_session_dependency_overhead():
+    scoped, shared = ScopedDBSession(), DBSession()
+    try:
+        # Warm up the engines and the shared factory
+        await resolve(scoped)
+        await resolve(shared)
+
+        # The best round of each, the others only add scheduling noise
+        before = min([await resolve(scoped) for _ in range(ROUNDS)])
+        after = min([await resolve(shared) for _ in range(ROUNDS)])
+        print(
+            f"\nsession dependency per request: {before * 1e6:.1f}us before, "
+            f"{after * 1e6:.1f}us after ({before / after:.1f}x)"
+        )
+        assert shared.get_session_factory() is shared.get_session_factory()
+        assert after * MIN_SPEEDUP < before
+    finally:
+        await scoped.get_async_engine().dispose()
+        await shared.get_async_engine().dispose()
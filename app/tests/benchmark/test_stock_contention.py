@@ -0,0 +1,73 @@
+import asyncio
+from time import perf_counter
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.models.models import Product
+from app.repository.product_repository import ProductRepository
+from app.settings import settings
+
+INITIAL_STOCK = 300
+CONCURRENCY = 20
+
+
+@pytest.mark.asyncio
+async def test_decrement_hot_sku_under_contention():
+    db_url_pg = str(settings.db_url).replace(
+        f"{settings.db_url.port}{settings.db_url.path}",
+        f"{settings.db_url.port}/postgres",
+    )
+    engine = create_async_engine(db_url_pg, pool_size=CONCURRENCY, max_overflow=0)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as connection:
+        await connection.run_sync(
+            Base.metadata.create_all,  # pylint: disable = no-member
+        )
+
+    product = Product(
+        name=f"Hot SKU {uuid4()}",
+        description="Produto disputado",
+        value=10,
+        quantity=INITIAL_STOCK,
+    )
+    async with session_factory.begin() as session:
+        session.add(product)
+
+    async def buyer() -> int:
+        bought = 0
+        async with session_factory() as session:
+            repository = ProductRepository(session)
+            while True:
+                async with session.begin():
+                    quantity = await repository.decrement_by_id(
+                        product.product_id, "quantity", 1
+                    )
+                if quantity is None:
+                    return bought
+                bought += 1
+
+    try:
+        start = perf_counter()
+        bought = await asyncio.gather(*(buyer() for _ in range(CONCURRENCY)))
+        elapsed = perf_counter() - start
+
+        async with session_factory() as session:
+            quantity = await session.scalar(
+                select(Product.quantity).where(Product.product_id == product.product_id)
+            )
+        print(
+            f"\n{sum(bought)} decrements on one row by {CONCURRENCY} clients "
+            f"in {elapsed:.3f}s ({sum(bought) / elapsed:.0f}/s)"
+        )
+        assert sum(bought) == INITIAL_STOCK
+        assert quantity == 0
+    finally:
+        async with session_factory.begin() as session:
+            await session.execute(
+                delete(Product).where(Product.product_id == product.product_id)
+            )
+        await engine.dispose()
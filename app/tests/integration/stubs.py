@@ -4,3 +4,10 @@ CORRECT_PAYLOAD = {
     "value": 89.90,
     "quantity": 159,
 }
+
+
+BATCH_ITEM_PAYLOAD = {
+    "description": "Produto incrivelmente incrível",
+    "value": 89.90,
+    "quantity": 159,
+}
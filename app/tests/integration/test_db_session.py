@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.db.dependencies import (
+    AFTER_COMMIT,
+    REPLICA,
+    DBSession,
+    db_session,
+    read_only_db_session,
+)
+from app.db.query_stats import RequestSQLStats, request_sql_stats
+
+
+@pytest.mark.asyncio
+async def test_read_only_session_runs_read_only_transactions():
+    pool = DBSession.get_async_engine().sync_engine.pool
+    try:
+        async with read_only_db_session.db_session() as session:
+            assert pool.checkedout() == 0
+            assert await session.scalar(text("SHOW transaction_read_only")) == "on"
+            with pytest.raises(DBAPIError):
+                await session.execute(text("CREATE TEMPORARY TABLE read_only (id int)"))
+        assert pool.checkedout() == 0
+
+        async with db_session.db_session() as session:
+            assert await session.scalar(text("SHOW transaction_read_only")) == "off"
+    finally:
+        await DBSession.get_async_engine().dispose()
+
+
+@pytest.mark.asyncio
+async def test_after_commit_callbacks_run_once_committed():
+    calls = []
+
+    async def callback():
+        calls.append(await session.scalar(text("SELECT 1")))
+
+    try:
+        async with db_session.db_session() as session:
+            session.info.setdefault(AFTER_COMMIT, []).append(callback)
+            assert calls == []
+        assert calls == [1]
+
+        with pytest.raises(ZeroDivisionError):
+            async with db_session.db_session() as session:
+                session.info.setdefault(AFTER_COMMIT, []).append(callback)
+                1 / 0
+        assert calls == [1]
+    finally:
+        await DBSession.get_async_engine().dispose()
+
+
+@pytest.mark.asyncio
+async def test_replica_sessions_are_marked():
+    engine = DBSession.get_async_engine()
+    try:
+        async with read_only_db_session.db_session() as session:
+            assert session.info[REPLICA] is False
+        async with read_only_db_session.db_session(engine) as session:
+            assert session.info[REPLICA] is True
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_commit_is_counted_in_the_request_statements():
+    stats = RequestSQLStats()
+    token = request_sql_stats.set(stats)
+    try:
+        async with db_session.db_session() as session:
+            await session.execute(text("SELECT 1"))
+            assert stats.count == 1
+        assert stats.count == 2
+    finally:
+        request_sql_stats.reset(token)
+        await DBSession.get_async_engine().dispose()
+
+
+@pytest.mark.asyncio
+async def test_unused_session_runs_no_statements():
+    stats = RequestSQLStats()
+    token = request_sql_stats.set(stats)
+    try:
+        async with db_session.db_session() as session:
+            pass
+        assert stats.count == 0
+        assert not session.in_transaction()
+    finally:
+        request_sql_stats.reset(token)
+        await DBSession.get_async_engine().dispose()
@@ -0,0 +1,203 @@
+import logging
+from contextlib import AsyncExitStack
+from unittest import mock
+
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from starlette import status
+
+from app.db.engine import count_statement_cache, create_engine
+from app.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_db_metrics_count_statement_cache_hits(async_client: AsyncClient):
+    metrics = (
+        "db_compiled_cache_requests_total",
+        "db_prepared_statement_cache_requests_total",
+    )
+    before = {
+        metric: REGISTRY.get_sample_value(metric, {"result": "hit"})
+        for metric in metrics
+    }
+    engine = create_engine(
+        str(settings.db_url), name="statements", pool_size=1, max_overflow=0
+    )
+    try:
+        async with engine.connect() as connection:
+            # Stays off the product table, locked by the test transaction
+            for value in range(3):
+                await connection.execute(select(func.abs(literal(value))))
+    finally:
+        await engine.dispose()
+
+    for metric in metrics:
+        after = REGISTRY.get_sample_value(metric, {"result": "hit"})
+        assert after - before[metric] >= 2
+
+    response = await async_client.get("/metrics")
+    assert 'db_compiled_cache_requests_total{result="hit"}' in response.text
+
+
+def test_statement_cache_counters_skip_an_unknown_prepared_cache():
+    prepared = {
+        result: REGISTRY.get_sample_value(
+            "db_prepared_statement_cache_requests_total", {"result": result}
+        )
+        for result in ("hit", "miss")
+    }
+    compiled_hits = REGISTRY.get_sample_value(
+        "db_compiled_cache_requests_total", {"result": "hit"}
+    )
+    connection = mock.Mock()
+    connection.connection.dbapi_connection._prepared_statement_cache = object()
+    context = mock.Mock(cache_hit=CacheStats.CACHE_HIT)
+
+    count_statement_cache(connection, None, "SELECT 1", (), context, False)
+
+    assert (
+        REGISTRY.get_sample_value(
+            "db_compiled_cache_requests_total", {"result": "hit"}
+        )
+        == compiled_hits + 1
+    )
+    for result, count in prepared.items():
+        assert (
+            REGISTRY.get_sample_value(
+                "db_prepared_statement_cache_requests_total", {"result": result}
+            )
+            == count
+        )
+
+
+@pytest.mark.asyncio
+async def test_db_connections_keep_cached_plans():
+    engine = create_engine(
+        str(settings.db_url), name="plans", pool_size=1, max_overflow=0
+    )
+    try:
+        async with engine.connect() as connection:
+            plan_cache_mode = await connection.scalar(text("SHOW plan_cache_mode"))
+        assert plan_cache_mode == "auto"
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_db_metrics_report_pool_saturation(async_client: AsyncClient, caplog):
+    labels = {"pool": "saturated"}
+    engine = create_engine(
+        str(settings.db_url),
+        name="saturated",
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.2,
+    )
+    try:
+        async with AsyncExitStack() as stack:
+            for _ in range(2):
+                await stack.enter_async_context(engine.connect())
+            with caplog.at_level(logging.WARNING), pytest.raises(PoolTimeoutError):
+                await engine.connect().start()
+
+            assert REGISTRY.get_sample_value("db_pool_connections_in_use", labels) == 2
+            assert (
+                REGISTRY.get_sample_value("db_pool_connections_overflow", labels) == 1
+            )
+    finally:
+        await engine.dispose()
+
+    assert REGISTRY.get_sample_value("db_pool_connections_in_use", labels) == 0
+    assert REGISTRY.get_sample_value("db_pool_connections_overflow", labels) == 0
+    assert (
+        REGISTRY.get_sample_value("db_pool_checkout_timeouts_total", labels) == 1
+    )
+    assert (
+        REGISTRY.get_sample_value("db_pool_checkout_duration_seconds_count", labels)
+        == 3
+    )
+    assert "for a connection of pool saturated" in caplog.text
+
+    response = await async_client.get("/metrics")
+    assert 'db_pool_connections_in_use{pool="saturated"} 0.0' in response.text
+    assert 'le="+Inf",pool="saturated"} 3.0' in response.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_count_requests_by_route_template(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    for _ in range(2):
+        response = await async_client.get(
+            f"/product/{product_mocked.product_id}", headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+    await async_client.get("/does-not-exist")
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_requests_total{method="GET",route="/product/{product_id}",status="200"}'
+        in response.text
+    )
+    assert 'route="<unmatched>",status="404"' in response.text
+    assert str(product_mocked.product_id) not in response.text
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert 'http_requests_in_progress{method="GET"} 1.0' in response.text
+
+
+@pytest.mark.asyncio
+async def test_server_timing_reports_request_statements(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    await product_factory.create_batch(3)
+    response = await async_client.get("/product", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    # The page count and the page itself
+    assert response.headers["server-timing"].startswith('db;desc="2 queries";dur=')
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_with_parameter_shapes(
+    async_client: AsyncClient,
+    product_mocked,
+    headers,
+    caplog
+):
+    with mock.patch.object(
+        settings, "db_slow_query_threshold", 0
+    ), caplog.at_level(logging.WARNING):
+        response = await async_client.get(
+            f"/product/{product_mocked.product_id}", headers=headers
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert "Slow query took" in caplog.text
+    assert "with parameters (UUID)" in caplog.text
+    assert str(product_mocked.product_id) not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_log_their_plan(
+    async_client: AsyncClient,
+    product_mocked,
+    headers,
+    caplog
+):
+    with mock.patch.object(settings, "db_slow_query_threshold", 0), mock.patch.object(
+        settings, "db_slow_query_explain", True
+    ), caplog.at_level(logging.WARNING):
+        response = await async_client.get(
+            f"/product/{product_mocked.product_id}", headers=headers
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert "Execution Time" in caplog.text
+    assert "EXPLAIN failed" not in caplog.text
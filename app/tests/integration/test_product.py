@@ -1,13 +1,26 @@
+import asyncio
+import csv
+import io
+import json
 from datetime import datetime
+from unittest import mock
 from uuid import uuid4
 
 import pytest
 from httpx import AsyncClient
-from sqlalchemy import select
+from sqlalchemy import delete, event, insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from starlette import status
 
+from app.cache import get_product_cache
+from app.cache.backends import NullCacheBackend
+from app.db.base import Base
+from app.db.dependencies import AFTER_COMMIT, REPLICA
+from app.db.engine import create_engine
 from app.models.models import Product
-from app.tests.integration.stubs import CORRECT_PAYLOAD
+from app.repository.product_repository import ProductRepository
+from app.settings import settings
+from app.tests.integration.stubs import BATCH_ITEM_PAYLOAD, CORRECT_PAYLOAD
 
 
 @pytest.mark.asyncio
@@ -84,6 +97,139 @@ async def test_create_product_fail_with_existing_name(
     assert response.json()["error_message"] == "Product integrity error"
 
 
+@pytest.mark.asyncio
+async def test_create_product_reuses_name_of_deleted_product(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    response = await async_client.delete(
+        f"/product/{product_mocked.product_id}",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.post(
+        "/product",
+        json={**BATCH_ITEM_PAYLOAD, "name": product_mocked.name},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["product_id"] != str(product_mocked.product_id)
+
+
+@pytest.mark.asyncio
+async def test_create_products_batch_reports_name_conflicts(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    payload = [
+        {**BATCH_ITEM_PAYLOAD, "name": "Camisa Adidas Running"},
+        {**BATCH_ITEM_PAYLOAD, "name": product_mocked.name},
+        {**BATCH_ITEM_PAYLOAD, "name": "Bermuda Adidas Running"},
+        {**BATCH_ITEM_PAYLOAD, "name": "Camisa Adidas Running"},
+    ]
+    response = await async_client.post(
+        "/product/batch",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["name"] for item in response.json()["created"]] == [
+        "Camisa Adidas Running",
+        "Bermuda Adidas Running",
+    ]
+    assert [
+        (item["index"], item["error_code"]) for item in response.json()["conflicts"]
+    ] == [(1, "conflict"), (3, "conflict")]
+
+    response = await async_client.get(
+        "/product",
+        params={"name": "Adidas", "page": 1, "size": 10},
+        headers=headers
+    )
+    assert response.json()["total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_create_products_batch_fail_with_invalid_item(
+    async_client: AsyncClient,
+    headers
+):
+    payload = [
+        {**BATCH_ITEM_PAYLOAD, "name": "Camisa Adidas Running"},
+        {**BATCH_ITEM_PAYLOAD, "name": " "},
+    ]
+    response = await async_client.post(
+        "/product/batch",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["error_message"][0]["loc"] == ["body", 1, "name"]
+
+
+@pytest.mark.asyncio
+async def test_import_products_from_ndjson(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    url = f"/product/{product_mocked.product_id}"
+    # Cached before the import, which must invalidate it
+    assert (await async_client.get(url, headers=headers)).status_code == 200
+    records = [
+        {**BATCH_ITEM_PAYLOAD, "name": "Camisa Adidas Running"},
+        {**BATCH_ITEM_PAYLOAD, "name": product_mocked.name, "quantity": 7},
+        {**BATCH_ITEM_PAYLOAD, "name": "Bermuda Adidas Running", "value": 0},
+    ]
+    body = "\n".join(json.dumps(record) for record in records) + "\nnot json\n"
+    response = await async_client.post(
+        "/product/import",
+        params={"format": "ndjson"},
+        content=body.encode(),
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    summary = response.json()
+    assert (summary["inserted"], summary["updated"], summary["rejected"]) == (1, 1, 2)
+    assert [error["line"] for error in summary["errors"]] == [3, 4]
+    assert summary["errors"][1]["error_message"] == "Invalid JSON"
+
+    response = await async_client.get(url, headers=headers)
+    assert response.json()["quantity"] == 7
+
+
+@pytest.mark.asyncio
+async def test_import_products_from_csv(
+    async_client: AsyncClient,
+    headers
+):
+    body = (
+        "name,description,value,quantity\n"
+        '"Camisa Adidas Running","Camisa feita para ""corrida""",89.90,10\n'
+        "Bermuda Adidas Running,Bermuda feita para corrida,59.90,5\n"
+        "Camisa Adidas Running,Camisa atualizada,79.90,3\n"
+    )
+    response = await async_client.post(
+        "/product/import",
+        params={"format": "csv"},
+        content=body.encode(),
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    summary = response.json()
+    assert (summary["inserted"], summary["updated"], summary["rejected"]) == (2, 1, 0)
+
+    response = await async_client.get(
+        "/product",
+        params={"name": "Camisa", "page": 1, "size": 10},
+        headers=headers
+    )
+    assert response.json()["items"][0]["description"] == "Camisa atualizada"
+
+
 @pytest.mark.asyncio
 async def test_create_invalid_auth(
     async_client: AsyncClient,
@@ -130,6 +276,137 @@ async def test_get_all_products_success_without_filter(
     assert response.json()["size"] == 10
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["", "/cursor", "/{product_id}"])
+async def test_fast_path_renders_like_response_model_validation(
+    async_client: AsyncClient,
+    product_factory,
+    headers,
+    path
+):
+    products = await product_factory.create_batch(3)
+    url = f"/product{path}".format(product_id=products[0].product_id)
+
+    with mock.patch.object(settings, "json_response_fast_path", False):
+        validated = await async_client.get(url, headers=headers)
+    fast = await async_client.get(url, headers=headers)
+
+    assert validated.status_code == fast.status_code == status.HTTP_200_OK
+    assert fast.json() == validated.json()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path, params",
+    [
+        ("", {}),
+        ("", {"fields": "product_id,value"}),
+        ("/cursor", {}),
+        ("/{product_id}", {}),
+    ],
+)
+async def test_fast_path_renders_with_standard_library_json(
+    async_client: AsyncClient,
+    product_factory,
+    headers,
+    path,
+    params
+):
+    products = await product_factory.create_batch(3)
+    url = f"/product{path}".format(product_id=products[0].product_id)
+
+    fast = await async_client.get(url, params=params, headers=headers)
+    with mock.patch.object(settings, "json_response_class", "json"):
+        response = await async_client.get(url, params=params, headers=headers)
+
+    assert response.status_code == fast.status_code == status.HTTP_200_OK
+    assert response.json() == fast.json()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", ["estimated", "none"])
+async def test_get_all_products_without_exact_count(
+    async_client: AsyncClient,
+    product_factory,
+    headers,
+    count
+):
+    await product_factory.create_batch(15)
+    response = await async_client.get(
+        "/product",
+        params={"page": 2, "size": 10, "count": count},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["count_strategy"] == count
+    assert len(response.json()["items"]) == 5
+    if count == "none":
+        assert response.json()["total"] is None
+    else:
+        assert response.json()["total"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_estimated_count_leaves_deleted_out(
+    async_client: AsyncClient,
+    headers,
+    statements
+):
+    response = await async_client.get(
+        "/product", params={"count": "estimated"}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    [explain] = [
+        statement for statement in statements if statement.startswith("EXPLAIN")
+    ]
+    assert "product.deleted_at IS NULL" in explain
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_with_cached_count(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    await product_factory.create_batch(5)
+    params = {"page": 1, "size": 10, "count": "cached"}
+    response = await async_client.get("/product", params=params, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == 5
+    assert response.json()["count_strategy"] == "cached"
+
+    await product_factory.create_batch(2)
+    response = await async_client.get("/product", params=params, headers=headers)
+    assert response.json()["total"] == 5
+    assert len(response.json()["items"]) == 7
+
+    response = await async_client.get("/product", headers=headers)
+    assert response.json()["total"] == 7
+    assert response.json()["count_strategy"] == "exact"
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_with_cached_count_without_redis(
+    app,
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    # The product cache a deployment without CACHE_REDIS_URL gets
+    del app.dependency_overrides[get_product_cache]
+    assert isinstance(get_product_cache(), NullCacheBackend)
+
+    await product_factory.create_batch(3)
+    params = {"page": 1, "size": 10, "count": "cached"}
+    response = await async_client.get("/product", params=params, headers=headers)
+    assert response.json()["total"] == 3
+
+    await product_factory.create_batch(1)
+    response = await async_client.get("/product", params=params, headers=headers)
+    assert response.json()["total"] == 3
+    assert len(response.json()["items"]) == 4
+
+
 @pytest.mark.asyncio
 async def test_get_all_products_invalid_auth(
     async_client: AsyncClient,
@@ -221,139 +498,373 @@ async def test_get_all_products_success_with_filter_description_and_product_id(
 
 
 @pytest.mark.asyncio
-async def test_get_by_product_id_success(
+async def test_get_all_products_success_with_full_text_search(
     async_client: AsyncClient,
-    product_mocked,
+    product_factory,
     headers
 ):
+    await product_factory.create(
+        name="Tênis Nike Wiflo", description="Tênis inspirado no Adidas Running"
+    )
+    await product_factory.create(
+        name="Camisa Adidas Running", description="Camisa feita para corrida"
+    )
+    await product_factory.create(
+        name="Bermuda Puma", description="Bermuda feita para corrida"
+    )
+
     response = await async_client.get(
-        f"/product/{product_mocked.product_id}",
+        "/product",
+        params={"q": "adidas running", "page": 1, "size": 10},
         headers=headers
     )
     assert response.status_code == status.HTTP_200_OK
-    assert response.json()["name"] == product_mocked.name
+    assert response.json()["total"] == 2
+    assert [item["name"] for item in response.json()["items"]] == [
+        "Camisa Adidas Running",
+        "Tênis Nike Wiflo",
+    ]
 
 
 @pytest.mark.asyncio
-async def test_get_by_product_invalid_token(
+async def test_get_all_products_by_cursor_walks_every_page(
     async_client: AsyncClient,
-    product_mocked,
-    headers_invalid_token
+    product_factory,
+    headers
 ):
-    response = await async_client.get(
-        f"/product/{product_mocked.product_id}",
-        headers=headers_invalid_token
-    )
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED
-    assert response.json()["error_message"] == "Invalid token"
+    await product_factory.create_batch(25)
+
+    product_ids, cursor, pages = [], None, 0
+    while True:
+        params = {"size": 10}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get(
+            "/product/cursor",
+            params=params,
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert "total" not in response.json()
+        assert "previous_page" not in response.json()
+        product_ids += [item["product_id"] for item in response.json()["items"]]
+        pages += 1
+        cursor = response.json()["next_page"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(product_ids) == 25
+    assert len(set(product_ids)) == 25
 
 
 @pytest.mark.asyncio
-async def test_get_by_product_expired_token(
+async def test_get_all_products_by_cursor_with_filter_name(
     async_client: AsyncClient,
-    product_mocked,
-    headers_expired_token
+    product_factory,
+    headers
 ):
+    await product_factory.create(
+        name="Camisa Adidas Running", description="Camisa feita para corrida"
+    )
+    await product_factory.create(
+        name="Tênis Nike Wiflo", description="Tênis feito para corrida"
+    )
+
     response = await async_client.get(
-        f"/product/{product_mocked.product_id}",
-        headers=headers_expired_token
+        "/product/cursor",
+        params={"name": "Adidas", "size": 10},
+        headers=headers
     )
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED
-    assert response.json()["error_message"] == "Invalid token"
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["items"]) == 1
+    assert response.json()["next_page"] is None
 
 
 @pytest.mark.asyncio
-async def test_get_by_product_id_with_product_deleted(
+async def test_get_all_products_by_cursor_invalid_cursor(
     async_client: AsyncClient,
-    product_mocked,
     headers
 ):
-    product_mocked.deleted_at = datetime.now()
     response = await async_client.get(
-        f"/product/{product_mocked.product_id}",
+        "/product/cursor",
+        params={"cursor": "ABRACADABRA", "size": 10},
         headers=headers
     )
-    assert response.status_code == status.HTTP_404_NOT_FOUND
-    assert response.json()["error_message"] == "Product not found"
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["error_message"] == "Invalid cursor"
 
 
 @pytest.mark.asyncio
-async def test_get_by_product_id_not_found(
+async def test_export_products_as_ndjson(
     async_client: AsyncClient,
+    product_factory,
     headers
 ):
+    await product_factory.create_batch(5)
     response = await async_client.get(
-        f"/product/{uuid4()}",
+        "/product/export",
+        params={"format": "ndjson"},
         headers=headers
     )
-    assert response.status_code == status.HTTP_404_NOT_FOUND
-    assert response.json()["error_message"] == "Product not found"
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    products = [json.loads(line) for line in response.text.splitlines()]
+    assert len(products) == 5
+    assert set(products[0]) == {
+        "product_id",
+        "name",
+        "description",
+        "value",
+        "quantity",
+    }
 
 
 @pytest.mark.asyncio
-async def test_get_by_product_id_invalid(
+async def test_export_products_as_csv_with_filter_name(
     async_client: AsyncClient,
+    product_factory,
     headers
 ):
+    await product_factory.create(
+        name="Camisa Adidas Running", description="Camisa feita para corrida"
+    )
+    await product_factory.create(
+        name="Tênis Nike Wiflo", description="Tênis feito para corrida"
+    )
     response = await async_client.get(
-        "/product/72",
+        "/product/export",
+        params={"format": "csv", "name": "Adidas"},
         headers=headers
     )
-    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
-    assert response.json()["error_message"][0]["msg"] == "value is not a valid uuid"
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+
+    products = list(csv.DictReader(io.StringIO(response.text)))
+    assert [product["name"] for product in products] == ["Camisa Adidas Running"]
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "data_update, field, result",
-    [
-        ({"name": "Novo Nome"}, "name", "Novo Nome"),
-        ({"value": 23.75}, "value", 23.75),
-        ({"quantity": 1}, "quantity", 1),
-        (
-            {"description": "Descrição atualizada"},
-            "description",
-            "Descrição atualizada",
-        ),
-    ],
-    ids=[
-        "Deve atualizar somente name",
-        "Deve atualizar somente value",
-        "Deve atualizar somente quantity",
-        "Deve atualizar somente description",
-    ],
-)
-async def test_update_by_product_id(
+async def test_get_by_product_id_success(
     async_client: AsyncClient,
-    headers,
     product_mocked,
-    data_update,
-    field,
-    result
+    headers
 ):
-    response = await async_client.patch(
-        f"/product/{product_mocked.product_id}",
-        json=data_update,
-        headers=headers
-    )
-    assert response.status_code == status.HTTP_204_NO_CONTENT
-
     response = await async_client.get(
         f"/product/{product_mocked.product_id}",
         headers=headers
     )
     assert response.status_code == status.HTTP_200_OK
-    assert response.json()[field] == result
+    assert response.json()["name"] == product_mocked.name
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "data_update, msg_error",
-    [
-        ({"value": "string"}, "value is not a valid float"),
-        ({"value": 0}, "The field must be greater than zero."),
-        ({"value": 1.933}, "The value cannot have more than two decimal places"),
-        ({"value": 10000000000.93}, "The value exceeds the expected size."),
+async def test_get_by_product_id_is_served_from_cache(
+    async_client: AsyncClient,
+    product_mocked,
+    product_cache,
+    headers
+):
+    for _ in range(3):
+        response = await async_client.get(
+            f"/product/{product_mocked.product_id}",
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["name"] == product_mocked.name
+
+    assert product_cache.stats()["hits"] == 2
+    assert product_cache.stats()["misses"] == 1
+
+    response = await async_client.get("/metrics/cache")
+    assert response.json()["product"] == {
+        "backend": "memory",
+        "hits": 2,
+        "misses": 1,
+        "hit_rate": 2 / 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_cache_is_invalidated_on_write(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    url = f"/product/{product_mocked.product_id}"
+    response = await async_client.get(url, headers=headers)
+    assert response.json()["name"] == product_mocked.name
+
+    await async_client.patch(url, json={"name": "Novo Nome"}, headers=headers)
+    response = await async_client.get(url, headers=headers)
+    assert response.json()["name"] == "Novo Nome"
+
+    await async_client.delete(url, headers=headers)
+    response = await async_client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_from_replica_is_not_cached(
+    async_client: AsyncClient,
+    db_session,
+    product_cache,
+    product_mocked,
+    headers
+):
+    url = f"/product/{product_mocked.product_id}"
+    db_session.info[REPLICA] = True
+    for _ in range(2):
+        response = await async_client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+    assert product_cache.stats()["misses"] == 2
+
+    db_session.info[REPLICA] = False
+    await async_client.get(url, headers=headers)
+    await async_client.get(url, headers=headers)
+    assert product_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_cache_is_invalidated_again_after_commit(
+    async_client: AsyncClient,
+    db_session,
+    product_cache,
+    product_mocked,
+    headers
+):
+    url = f"/product/{product_mocked.product_id}"
+    cache_key = f"product:{product_mocked.product_id}"
+    await async_client.patch(url, json={"name": "Novo Nome"}, headers=headers)
+    # A read racing the PATCH cached the row as it was before the COMMIT
+    await product_cache.set(cache_key, "stale")
+
+    for callback in db_session.info.pop(AFTER_COMMIT):
+        await callback()
+    assert await product_cache.get(cache_key) is None
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_invalid_token(
+    async_client: AsyncClient,
+    product_mocked,
+    headers_invalid_token
+):
+    response = await async_client.get(
+        f"/product/{product_mocked.product_id}",
+        headers=headers_invalid_token
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["error_message"] == "Invalid token"
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_expired_token(
+    async_client: AsyncClient,
+    product_mocked,
+    headers_expired_token
+):
+    response = await async_client.get(
+        f"/product/{product_mocked.product_id}",
+        headers=headers_expired_token
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["error_message"] == "Invalid token"
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_with_product_deleted(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    product_mocked.deleted_at = datetime.now()
+    response = await async_client.get(
+        f"/product/{product_mocked.product_id}",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["error_message"] == "Product not found"
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_not_found(
+    async_client: AsyncClient,
+    headers
+):
+    response = await async_client.get(
+        f"/product/{uuid4()}",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["error_message"] == "Product not found"
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_invalid(
+    async_client: AsyncClient,
+    headers
+):
+    response = await async_client.get(
+        "/product/72",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["error_message"][0]["msg"] == "value is not a valid uuid"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "data_update, field, result",
+    [
+        ({"name": "Novo Nome"}, "name", "Novo Nome"),
+        ({"value": 23.75}, "value", 23.75),
+        ({"quantity": 1}, "quantity", 1),
+        (
+            {"description": "Descrição atualizada"},
+            "description",
+            "Descrição atualizada",
+        ),
+    ],
+    ids=[
+        "Deve atualizar somente name",
+        "Deve atualizar somente value",
+        "Deve atualizar somente quantity",
+        "Deve atualizar somente description",
+    ],
+)
+async def test_update_by_product_id(
+    async_client: AsyncClient,
+    headers,
+    product_mocked,
+    data_update,
+    field,
+    result
+):
+    response = await async_client.patch(
+        f"/product/{product_mocked.product_id}",
+        json=data_update,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.get(
+        f"/product/{product_mocked.product_id}",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[field] == result
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "data_update, msg_error",
+    [
+        ({"value": "string"}, "value is not a valid float"),
+        ({"value": 0}, "The field must be greater than zero."),
+        ({"value": 1.933}, "The value cannot have more than two decimal places"),
+        ({"value": 10000000000.93}, "The value exceeds the expected size."),
         ({"name": ""}, "Field cannot be an empty string"),
         ({"description": "  "}, "Field cannot be an empty string"),
     ],
@@ -389,6 +900,69 @@ async def test_update_product_fail_with_invalid_value_in_field(
     assert response.json()["error_message"][0]["msg"] == msg_error
 
 
+@pytest.mark.asyncio
+async def test_update_products_batch(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    first_product, second_product, deleted_product = (
+        await product_factory.create_batch(3)
+    )
+    deleted_product.deleted_at = datetime.now()
+    missing_id = str(uuid4())
+
+    payload = [
+        {"product_id": str(first_product.product_id), "value": 12.5},
+        {"product_id": str(second_product.product_id), "quantity": 3},
+        {"product_id": str(deleted_product.product_id), "quantity": 3},
+        {"product_id": missing_id, "quantity": 3},
+    ]
+    response = await async_client.patch(
+        "/product/batch",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()["updated"]) == {
+        str(first_product.product_id),
+        str(second_product.product_id),
+    }
+    assert response.json()["missing"] == [str(deleted_product.product_id), missing_id]
+
+    response = await async_client.get(
+        f"/product/{first_product.product_id}",
+        headers=headers
+    )
+    assert response.json()["value"] == 12.5
+    assert response.json()["quantity"] == first_product.quantity
+
+    response = await async_client.get(
+        f"/product/{second_product.product_id}",
+        headers=headers
+    )
+    assert response.json()["value"] == float(second_product.value)
+    assert response.json()["quantity"] == 3
+
+
+@pytest.mark.asyncio
+async def test_update_products_batch_with_existing_name(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    first_product, second_product = await product_factory.create_batch(2)
+    payload = [
+        {"product_id": str(second_product.product_id), "name": first_product.name}
+    ]
+    response = await async_client.patch(
+        "/product/batch",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
 @pytest.mark.asyncio
 async def test_update_with_existing_name(
     async_client: AsyncClient,
@@ -438,6 +1012,215 @@ async def test_update_by_product_id_with_expired_token(
     assert response.json()["error_message"] == "Invalid token"
 
 
+@pytest.mark.asyncio
+async def test_decrement_stock(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    url = f"/product/{product_mocked.product_id}/stock/decrement"
+    response = await async_client.post(
+        url,
+        json={"quantity": product_mocked.quantity},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "product_id": str(product_mocked.product_id),
+        "quantity": 0,
+    }
+
+    response = await async_client.post(url, json={"quantity": 1}, headers=headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["error_message"] == "Insufficient stock"
+
+
+@pytest.mark.asyncio
+async def test_decrement_stock_not_found(
+    async_client: AsyncClient,
+    headers
+):
+    response = await async_client.post(
+        f"/product/{uuid4()}/stock/decrement",
+        json={"quantity": 1},
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_decrement_stocks_batch_is_all_or_nothing(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    first_product, second_product = await product_factory.create_batch(2)
+    payload = [
+        {"product_id": str(first_product.product_id), "quantity": 1},
+        {
+            "product_id": str(second_product.product_id),
+            "quantity": second_product.quantity + 1,
+        },
+    ]
+    response = await async_client.post(
+        "/product/stock/decrement",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert str(second_product.product_id) in response.json()["error_message"]
+
+    response = await async_client.get(
+        f"/product/{first_product.product_id}",
+        headers=headers
+    )
+    assert response.json()["quantity"] == first_product.quantity
+
+    payload[1]["quantity"] = second_product.quantity
+    response = await async_client.post(
+        "/product/stock/decrement",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert {item["product_id"]: item["quantity"] for item in response.json()} == {
+        str(first_product.product_id): first_product.quantity - 1,
+        str(second_product.product_id): 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_decrement_stocks_batch_is_a_single_statement(
+    async_client: AsyncClient,
+    product_factory,
+    headers,
+    statements
+):
+    products = await product_factory.create_batch(3)
+    payload = [
+        {"product_id": str(product.product_id), "quantity": 1} for product in products
+    ]
+    statements.clear()
+    response = await async_client.post(
+        "/product/stock/decrement",
+        json=payload,
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(statements) == 1
+    assert statements[0].startswith("WITH data AS")
+    assert "FOR UPDATE" in statements[0]
+
+
+@pytest.mark.asyncio
+async def test_decrement_stocks_batches_in_opposite_orders_do_not_deadlock():
+    # Own engine and committed rows: the test transaction locks the table
+    engine = create_engine(str(settings.db_url), name="contention")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    names = [f"Contention {uuid4()}" for _ in range(100)]
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            result = await connection.execute(
+                insert(Product).returning(Product.product_id),
+                [
+                    {"name": name, "description": name, "value": 1, "quantity": 100}
+                    for name in names
+                ],
+            )
+            ids = result.scalars().all()
+            await connection.execute(text("ANALYZE product"))
+
+        async def decrement(product_ids):
+            async with sessions() as session:
+                # The plan of a large table: the VALUES list drives an index
+                # lookup per row, so rows are locked in the order of the batch
+                for method in ("seqscan", "hashjoin", "mergejoin"):
+                    await session.execute(text(f"SET enable_{method} = off"))
+                await ProductRepository(session).decrement_many_by_id(
+                    dict.fromkeys(product_ids, 1), "quantity"
+                )
+                await session.commit()
+
+        async with sessions() as blocker:
+            middle = ids[len(ids) // 2]
+            await blocker.execute(
+                select(Product).where(Product.product_id == middle).with_for_update()
+            )
+            batches = asyncio.gather(decrement(ids), decrement(ids[::-1]))
+            # Released once both batches wait on a lock, halfway through their rows
+            waiting = text("SELECT count(*) FROM pg_locks WHERE NOT granted")
+            while await blocker.scalar(waiting) < 2:
+                await asyncio.sleep(0.01)
+        await batches
+
+        async with sessions() as session:
+            quantities = await session.scalars(
+                select(Product.quantity).where(Product.product_id.in_(ids))
+            )
+            assert quantities.all() == [98] * len(ids)
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(delete(Product).where(Product.name.in_(names)))
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_update_products_batches_in_opposite_orders_do_not_deadlock():
+    # Own engine and committed rows: the test transaction locks the table
+    engine = create_engine(str(settings.db_url), name="contention")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    names = [f"Contention {uuid4()}" for _ in range(100)]
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            result = await connection.execute(
+                insert(Product).returning(Product.product_id),
+                [
+                    {"name": name, "description": name, "value": 1, "quantity": 100}
+                    for name in names
+                ],
+            )
+            ids = result.scalars().all()
+            await connection.execute(text("ANALYZE product"))
+
+        async def update(product_ids, quantity):
+            async with sessions() as session:
+                # The plan of a large table: the VALUES list drives an index
+                # lookup per row, so rows are locked in the order of the batch
+                for method in ("seqscan", "hashjoin", "mergejoin"):
+                    await session.execute(text(f"SET enable_{method} = off"))
+                updated_ids = await ProductRepository(session).update_many_by_id(
+                    [{"product_id": id, "quantity": quantity} for id in product_ids]
+                )
+                await session.commit()
+                return updated_ids
+
+        async with sessions() as blocker:
+            middle = ids[len(ids) // 2]
+            await blocker.execute(
+                select(Product).where(Product.product_id == middle).with_for_update()
+            )
+            batches = asyncio.gather(update(ids, 1), update(ids[::-1], 2))
+            # Released once both batches wait on a lock
+            waiting = text("SELECT count(*) FROM pg_locks WHERE NOT granted")
+            while await blocker.scalar(waiting) < 2:
+                await asyncio.sleep(0.01)
+        first, second = await batches
+        assert sorted(first) == sorted(second) == sorted(ids)
+
+        async with sessions() as session:
+            quantities = await session.scalars(
+                select(Product.quantity).where(Product.product_id.in_(ids))
+            )
+            # One batch ran entirely after the other
+            assert len(set(quantities.all())) == 1
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(delete(Product).where(Product.name.in_(names)))
+        await engine.dispose()
+
+
 @pytest.mark.asyncio
 async def test_delete_product_success(
     async_client: AsyncClient,
@@ -487,6 +1270,75 @@ async def test_delete_product_success_deleted_at_unchanged(
     assert second_product_db.deleted_at == first_product_db.deleted_at
 
 
+@pytest.mark.asyncio
+async def test_delete_product_not_found(
+    async_client: AsyncClient,
+    headers
+):
+    response = await async_client.delete(
+        f"/product/{uuid4()}",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_delete_products_batch(
+    async_client: AsyncClient,
+    db_session,
+    product_factory,
+    headers
+):
+    first_product, second_product = await product_factory.create_batch(2)
+    missing_id = uuid4()
+
+    response = await async_client.delete(
+        f"/product/{second_product.product_id}",
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.delete(
+        "/product",
+        params={
+            "ids": [
+                str(first_product.product_id),
+                str(second_product.product_id),
+                str(missing_id),
+            ]
+        },
+        headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "deleted": [
+            str(first_product.product_id),
+            str(second_product.product_id),
+        ],
+        "missing": [str(missing_id)],
+    }
+
+    statement = select(Product).filter_by(product_id=first_product.product_id)
+    query_set = await db_session.execute(statement)
+    assert query_set.scalar_one().deleted_at
+
+
+@pytest.mark.asyncio
+async def test_soft_delete_many_by_id_tells_deleted_from_already_deleted(
+    db_session,
+    product_factory
+):
+    first_product, second_product = await product_factory.create_batch(2)
+    repository = ProductRepository(db_session)
+    await repository.soft_delete_many_by_id([second_product.product_id])
+
+    deleted_ids, already_deleted_ids = await repository.soft_delete_many_by_id(
+        [first_product.product_id, second_product.product_id, uuid4()]
+    )
+    assert list(map(str, deleted_ids)) == [str(first_product.product_id)]
+    assert list(map(str, already_deleted_ids)) == [str(second_product.product_id)]
+
+
 @pytest.mark.asyncio
 async def test_delete_product_with_invalid_token(
     async_client: AsyncClient,
@@ -513,3 +1365,306 @@ async def test_delete_product_with_expired_token(
     )
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
     assert response.json()["error_message"] == "Invalid token"
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_answers_conditional_requests(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    url = f"/product/{product_mocked.product_id}"
+    response = await async_client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    for conditional in (
+        {"If-None-Match": etag},
+        {"If-None-Match": f'"other", W/{etag}'},
+        {"If-Modified-Since": last_modified},
+    ):
+        response = await async_client.get(url, headers={**headers, **conditional})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    response = await async_client.get(
+        url,
+        headers={
+            **headers,
+            "If-None-Match": '"other"',
+            "If-Modified-Since": last_modified,
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_etag_follows_the_listing(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    await product_factory.create_batch(3)
+    response = await async_client.get("/product", headers=headers)
+    etag = response.headers["etag"]
+
+    response = await async_client.get(
+        "/product", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await async_client.get(
+        "/product",
+        params={"size": 2},
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    await product_factory.create()
+    response = await async_client.get(
+        "/product", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == 4
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_update_by_product_id_honors_if_match(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    product, other_product = await product_factory.create_batch(2)
+    url = f"/product/{product.product_id}"
+    etag = (await async_client.get(url, headers=headers)).headers["etag"]
+    other_etag = (
+        await async_client.get(f"/product/{other_product.product_id}", headers=headers)
+    ).headers["etag"]
+
+    response = await async_client.patch(
+        url, json={"quantity": 5}, headers={**headers, "If-Match": other_etag}
+    )
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    response = await async_client.patch(
+        url, json={"quantity": 5}, headers={**headers, "If-Match": etag}
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = await async_client.patch(
+        url, json={"quantity": 6}, headers={**headers, "If-Match": etag}
+    )
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert response.json()["error_message"] == "Product was modified"
+
+    response = await async_client.get(url, headers=headers)
+    assert response.json()["quantity"] == 5
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_update_by_product_id_stamps_the_database_clock(
+    async_client: AsyncClient,
+    product_mocked,
+    headers,
+    statements
+):
+    response = await async_client.patch(
+        f"/product/{product_mocked.product_id}",
+        json={"quantity": 5},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    [statement] = [
+        statement for statement in statements if statement.startswith("UPDATE")
+    ]
+    assert "updated_at=clock_timestamp()" in statement
+
+
+@pytest.mark.asyncio
+async def test_update_by_product_id_with_if_match_not_found(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    etag = (
+        await async_client.get(f"/product/{product_mocked.product_id}", headers=headers)
+    ).headers["etag"]
+    response = await async_client.patch(
+        f"/product/{uuid4()}",
+        json={"quantity": 5},
+        headers={**headers, "If-Match": etag},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_is_compressed(
+    async_client: AsyncClient,
+    product_factory,
+    headers
+):
+    await product_factory.create_batch(10)
+    response = await async_client.get(
+        "/product", headers={**headers, "Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["total"] == 10
+
+    etag = response.headers["etag"]
+    assert etag.startswith("W/")
+    response = await async_client.get(
+        "/product", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await async_client.get(
+        "/product", headers={**headers, "Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    assert not response.headers["etag"].startswith("W/")
+
+
+@pytest.fixture
+def statements(db_session):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_renders_only_given_filters(
+    async_client: AsyncClient,
+    product_mocked,
+    headers,
+    statements
+):
+    response = await async_client.get(
+        "/product", params={"name": product_mocked.name}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == 1
+    # The ETag aggregate, which gives the total too, and the page
+    filtered = [statement for statement in statements if "ILIKE" in statement]
+    assert len(filtered) == len(statements) == 2
+    for statement in filtered:
+        assert "IS NULL OR" not in statement
+        assert "product.description" not in statement.partition("WHERE")[2]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", ["exact", "estimated"])
+async def test_get_all_products_with_fields(
+    async_client: AsyncClient,
+    product_factory,
+    headers,
+    statements,
+    count
+):
+    products = await product_factory.create_batch(3)
+    response = await async_client.get(
+        "/product",
+        params={"fields": "value, product_id", "count": count},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(
+        response.json()["items"], key=lambda item: item["product_id"]
+    ) == sorted(
+        (
+            {"product_id": str(product.product_id), "value": float(product.value)}
+            for product in products
+        ),
+        key=lambda item: item["product_id"],
+    )
+    selected = next(
+        statement for statement in statements if "LIMIT" in statement
+    ).partition("FROM")[0]
+    assert selected.split() == ["SELECT", "product.value,", "product.product_id"]
+
+
+@pytest.mark.asyncio
+async def test_get_all_products_with_single_field_and_without_fast_path(
+    async_client: AsyncClient,
+    product_mocked,
+    headers
+):
+    with mock.patch.object(settings, "json_response_fast_path", False):
+        response = await async_client.get(
+            "/product", params={"fields": "name"}, headers=headers
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["items"] == [{"name": product_mocked.name}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fields", ["", "name,deleted_at", "search_vector"])
+async def test_get_all_products_with_invalid_fields(
+    async_client: AsyncClient,
+    headers,
+    fields
+):
+    response = await async_client.get(
+        "/product", params={"fields": fields}, headers=headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["error_message"] == (
+        "fields must be a comma separated list of "
+        "name, description, value, quantity, product_id"
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_by_product_id_with_fields(
+    async_client: AsyncClient,
+    product_mocked,
+    headers,
+    statements
+):
+    url = f"/product/{product_mocked.product_id}"
+    response = await async_client.get(
+        url, params={"fields": "name,quantity"}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "name": product_mocked.name,
+        "quantity": product_mocked.quantity,
+    }
+    assert statements[-1].partition("FROM")[0].split() == [
+        "SELECT",
+        "product.name,",
+        "product.quantity,",
+        "product.product_id,",
+        "product.updated_at",
+    ]
+    etag = response.headers["etag"]
+    assert etag.startswith("W/")
+
+    response = await async_client.get(
+        url,
+        params={"fields": "name,quantity"},
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Projected reads leave the cache alone, full ones still fill it
+    await async_client.get(url, headers=headers)
+    response = await async_client.get(
+        url, params={"fields": "value"}, headers=headers
+    )
+    assert response.json() == {"value": float(product_mocked.value)}
+
+    response = await async_client.patch(
+        url, json={"quantity": 5}, headers={**headers, "If-Match": etag}
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
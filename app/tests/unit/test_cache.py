@@ -0,0 +1,82 @@
+from unittest import mock
+
+import pytest
+
+from app.cache import CacheBackend, get_product_cache
+from app.cache.backends import (
+    MemoryCacheBackend,
+    NullCacheBackend,
+    RedisCacheBackend,
+)
+from app.cache.lru import LRUTTLCache
+from app.settings import settings
+
+
+def test_lru_ttl_cache_evicts_least_recently_used():
+    cache = LRUTTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_ttl_cache_expires_entries():
+    cache = LRUTTLCache(max_size=10, ttl=60)
+    with mock.patch("app.cache.lru.monotonic", return_value=100):
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)
+    with mock.patch("app.cache.lru.monotonic", return_value=110):
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+    with mock.patch("app.cache.lru.monotonic", return_value=160):
+        assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_backend_counts_hits_and_misses():
+    cache = MemoryCacheBackend(max_size=10, ttl=60)
+    assert await cache.get("product:1") is None
+    await cache.set("product:1", "{}")
+    assert await cache.get("product:1") == "{}"
+    await cache.delete("product:1")
+    assert await cache.get("product:1") is None
+
+    assert cache.stats() == {
+        "backend": "memory",
+        "hits": 1,
+        "misses": 2,
+        "hit_rate": 1 / 3,
+    }
+
+
+@pytest.mark.parametrize(
+    "backend, redis_url, workers_count, expected",
+    [
+        (None, None, 4, NullCacheBackend),
+        (None, "redis://localhost:6379/0", 4, RedisCacheBackend),
+        ("memory", None, 1, MemoryCacheBackend),
+        ("memory", None, 4, NullCacheBackend),
+        ("none", "redis://localhost:6379/0", 1, NullCacheBackend),
+    ],
+)
+def test_get_product_cache_picks_the_backend(
+    backend, redis_url, workers_count, expected
+):
+    get_product_cache.cache_clear()
+    try:
+        with mock.patch.object(settings, "cache_backend", backend), mock.patch.object(
+            settings, "cache_redis_url", redis_url
+        ), mock.patch.object(settings, "workers_count", workers_count):
+            assert type(get_product_cache()) is expected
+    finally:
+        get_product_cache.cache_clear()
+
+
+def test_cache_backends_implement_the_whole_interface():
+    with pytest.raises(TypeError):
+        CacheBackend()
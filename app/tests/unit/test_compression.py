@@ -0,0 +1,143 @@
+import gzip
+from unittest import mock
+
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app.compression import (
+    CompressionMiddleware,
+    PrecompressedStaticFiles,
+    negotiate_encoding,
+)
+from app.precompress import precompress
+from app.settings import settings
+
+BODY = "product " * 500
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip, br;q=0.5", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "br"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, encoding):
+    assert negotiate_encoding(accept_encoding, ["zstd", "br", "gzip"]) == encoding
+
+
+async def streamed():
+    for _ in range(3):
+        yield BODY
+
+
+def app_with(*routes) -> Starlette:
+    app = Starlette(routes=list(routes))
+    app.add_middleware(CompressionMiddleware, minimum_size=1000)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_compression_middleware_compresses_above_the_threshold():
+    app = app_with(
+        Route("/large", lambda request: PlainTextResponse(BODY)),
+        Route("/small", lambda request: PlainTextResponse("product")),
+        Route(
+            "/stream",
+            lambda request: StreamingResponse(streamed(), media_type="text/plain"),
+        ),
+    )
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(BODY)
+        assert response.text == BODY
+
+        response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.text == "product"
+
+        response = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text == BODY * 3
+
+        response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_compression_middleware_flushes_every_chunk():
+    chunks = []
+
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")],
+            }
+        )
+        chunk = {"type": "http.response.body", "body": b"{}\n", "more_body": True}
+        for _ in range(3):
+            await send(chunk)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message["body"])
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    await CompressionMiddleware(app, minimum_size=1000)(scope, receive, send)
+
+    decompressor = gzip.zlib.decompressobj(31)
+    # Each chunk decodes on its own, nothing waits for the end of the stream
+    assert [decompressor.decompress(chunk) for chunk in chunks[:3]] == [b"{}\n"] * 3
+    assert decompressor.decompress(chunks[3]) == b""
+    assert decompressor.eof
+
+
+@pytest.mark.asyncio
+async def test_precompressed_static_files(tmp_path):
+    (tmp_path / "bundle.js").write_text(BODY)
+    precompress(str(tmp_path))
+    app = app_with(Mount("/static", PrecompressedStaticFiles(directory=tmp_path)))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for accept_encoding, encoding in (("gzip, br", "br"), ("gzip", "gzip")):
+            response = await client.get(
+                "/static/bundle.js", headers={"Accept-Encoding": accept_encoding}
+            )
+            assert response.headers["content-encoding"] == encoding
+            assert response.headers["content-type"].startswith("text/javascript")
+            assert response.headers["cache-control"] == (
+                f"public, max-age={settings.static_cache_max_age}"
+            )
+            assert response.text == BODY
+
+        with mock.patch.object(settings, "compression_encodings", []):
+            plain = app_with(
+                Mount("/static", PrecompressedStaticFiles(directory=tmp_path))
+            )
+        async with AsyncClient(app=plain, base_url="http://test") as plain_client:
+            response = await plain_client.get(
+                "/static/bundle.js", headers={"Accept-Encoding": "identity"}
+            )
+        assert "content-encoding" not in response.headers
+        assert response.text == BODY
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from app.api.helpers.conditional import (
+    collection_etag,
+    parse_version_etags,
+    version_etag,
+)
+
+UPDATED_AT = datetime(2023, 3, 20, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def test_version_etags_round_trip():
+    product_id = uuid4()
+    etag = version_etag(product_id, UPDATED_AT)
+    local = UPDATED_AT.astimezone(timezone(timedelta(hours=-3)))
+
+    assert version_etag(product_id, local) == etag
+    assert parse_version_etags(etag, product_id) == [UPDATED_AT]
+    assert parse_version_etags(f'"x", {etag}', product_id) == [UPDATED_AT]
+
+
+def test_parse_version_etags_skips_what_cannot_match():
+    product_id = uuid4()
+    etag = version_etag(product_id, UPDATED_AT)
+
+    assert parse_version_etags("*", product_id) is None
+    assert parse_version_etags(f"W/{etag}", product_id) == [UPDATED_AT]
+    assert parse_version_etags(etag, uuid4()) == []
+    assert parse_version_etags('"not-an-etag", ""', product_id) == []
+
+
+def test_collection_etag_changes_with_the_listing():
+    etag = collection_etag(10, UPDATED_AT, "page=1")
+
+    assert collection_etag(10, UPDATED_AT, "page=1") == etag
+    assert collection_etag(11, UPDATED_AT, "page=1") != etag
+    assert collection_etag(10, UPDATED_AT + timedelta(microseconds=1), "page=1") != etag
+    assert collection_etag(10, UPDATED_AT, "page=2") != etag
+    assert collection_etag(0, None, "") != etag
@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+from app.api.helpers.exception import HTTPError
+from app.api.helpers.fields import parse_fields, partial_schema
+from app.api.product.schemas import ProductSchema
+
+
+def test_parse_fields():
+    assert parse_fields(None, ProductSchema) is None
+    assert parse_fields(" value,name,,value ", ProductSchema) == ("name", "value")
+    for fields in ("", ",", "name,updated_at"):
+        with pytest.raises(HTTPError) as error:
+            parse_fields(fields, ProductSchema)
+        assert error.value.status_code == 400
+
+
+def test_partial_schema():
+    assert partial_schema(ProductSchema, None) is ProductSchema
+    schema = partial_schema(ProductSchema, ("name", "value"))
+    assert schema is partial_schema(ProductSchema, ("name", "value"))
+    assert list(schema.model_fields) == ["name", "value"]
+
+    product = schema.model_validate(
+        {"name": " Produto ", "value": "12.30", "quantity": 1}
+    )
+    assert product.model_dump() == {"name": "Produto", "value": Decimal("12.30")}
+    assert product.model_dump_json() == '{"name":"Produto","value":12.3}'
+    with pytest.raises(ValidationError):
+        schema.model_validate({"name": "Produto", "value": 0})
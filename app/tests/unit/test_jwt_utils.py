@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from time import monotonic
+from unittest import mock
+
+import pytest
+from jose import JWTError, jwt
+
+from app.api.helpers import jwt_utils
+from app.api.helpers.jwt_utils import create_token, decode_token
+from app.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def empty_token_caches():
+    jwt_utils.verified_tokens.clear()
+    jwt_utils.rejected_tokens.clear()
+    yield
+    jwt_utils.verified_tokens.clear()
+    jwt_utils.rejected_tokens.clear()
+
+
+def test_decode_token_verifies_a_token_once():
+    token = create_token("user")["access_token"]
+    with mock.patch.object(jwt_utils.jwt, "decode", wraps=jwt.decode) as decode:
+        assert decode_token(token)["sub"] == "user"
+        assert decode_token(token)["sub"] == "user"
+    assert decode.call_count == 1
+
+
+def test_decode_token_caches_rejected_tokens():
+    with mock.patch.object(jwt_utils.jwt, "decode", wraps=jwt.decode) as decode:
+        for _ in range(3):
+            with pytest.raises(JWTError):
+                decode_token("not-a-token")
+    assert decode.call_count == 1
+
+
+def test_decode_token_keeps_tokens_until_they_expire():
+    token = jwt.encode(
+        {"sub": "user", "exp": datetime.utcnow() + timedelta(seconds=30)},
+        settings.jwt_secret_key,
+        algorithm=settings.algorithm,
+    )
+    with mock.patch.object(jwt_utils.jwt, "decode", wraps=jwt.decode) as decode:
+        decode_token(token)
+        with mock.patch("app.cache.lru.monotonic", return_value=monotonic() + 20):
+            decode_token(token)
+        assert decode.call_count == 1
+        with mock.patch("app.cache.lru.monotonic", return_value=monotonic() + 40):
+            decode_token(token)
+        assert decode.call_count == 2
@@ -0,0 +1,10 @@
+from decimal import Decimal
+from uuid import uuid4
+
+from app.db.query_stats import parameter_shape
+
+
+def test_parameter_shape_hides_values():
+    assert parameter_shape((uuid4(), "Produto", None)) == "(UUID, str[7], NoneType)"
+    assert parameter_shape({"value": Decimal("1.50")}) == "{value: Decimal}"
+    assert parameter_shape([("a", 1), ("b", 2)]) == "2 x (str[1], int)"
@@ -0,0 +1,71 @@
+import time
+from unittest import mock
+
+import pytest
+
+from app.api.helpers.records import FileFormat, MalformedRecord, decode_records
+from app.settings import settings
+
+
+async def _body(text, chunk_size=4096):
+    data = text.encode()
+    for start in range(0, len(data), chunk_size):
+        end = start + chunk_size
+        yield data[start:end]
+
+
+async def _decode(text, file_format=FileFormat.csv):
+    return [
+        (line, str(record) if isinstance(record, MalformedRecord) else record)
+        async for line, record in decode_records(_body(text), file_format)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_decode_csv_keeps_quoted_fields_across_lines():
+    text = 'name,description\n"Camisa","Linha 1\nLinha ""2"""\nBermuda,Curta\n'
+
+    assert await _decode(text) == [
+        (2, {"name": "Camisa", "description": 'Linha 1\nLinha "2"'}),
+        (4, {"name": "Bermuda", "description": "Curta"}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_decode_csv_drops_a_stray_quote_at_the_record_size():
+    rows = "".join(f"Produto {number},Descricao\n" for number in range(40000))
+    text = f'name,description\n"Camisa,Descricao\n{rows}'
+
+    start = time.perf_counter()
+    with mock.patch.object(settings, "product_import_max_record_size", 1000):
+        records = await _decode(text)
+    elapsed = time.perf_counter() - start
+
+    assert records[0] == (2, "Record longer than 1000 characters")
+    assert records[-1] == (
+        40002,
+        {"name": "Produto 39999", "description": "Descricao"},
+    )
+    # Linear in the body, the whole 40k lines were taking seconds
+    assert elapsed < 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "file_format, text",
+    [
+        (FileFormat.csv, "name\n{}\nCamisa\n"),
+        (FileFormat.ndjson, '\n{}\n{{"name": "Camisa"}}\n'),
+    ],
+)
+async def test_decode_records_skips_lines_over_the_record_size(file_format, text):
+    # Spread over several chunks, none of them holding a newline
+    text = text.format("x" * 10000)
+
+    with mock.patch.object(settings, "product_import_max_record_size", 100):
+        records = await _decode(text, file_format)
+
+    assert records == [
+        (2, "Record longer than 100 characters"),
+        (3, {"name": "Camisa"}),
+    ]
@@ -89,4 +89,4 @@ def test_schemas(schema_cls, data, expected):
             schema_cls(**data)
     else:
         schema = schema_cls(**data)
-        assert schema.dict() == expected
+        assert schema.model_dump() == expected
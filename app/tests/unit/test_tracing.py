@@ -0,0 +1,70 @@
+import json
+from unittest import mock
+
+import pytest
+
+from app.api.metrics.middleware import PrometheusMiddleware
+from app.application import get_app
+from app.settings import settings
+from app.tracing import _span_processor, traced
+
+sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+export = pytest.importorskip("opentelemetry.sdk.trace.export")
+in_memory = pytest.importorskip(
+    "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+)
+asgi = pytest.importorskip("opentelemetry.instrumentation.asgi")
+
+
+async def lookup(product_id):
+    return product_id
+
+
+def test_traced_is_a_no_op_when_disabled():
+    with mock.patch.object(settings, "otel_enabled", False):
+        assert traced(lookup) is lookup
+
+
+@pytest.mark.asyncio
+async def test_traced_records_a_span_per_call():
+    exporter = in_memory.InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(export.SimpleSpanProcessor(exporter))
+
+    with mock.patch.object(settings, "otel_enabled", True), mock.patch(
+        "opentelemetry.trace.get_tracer",
+        side_effect=lambda name: provider.get_tracer(name),
+    ):
+        traced_lookup = traced(lookup)
+
+    assert await traced_lookup(7) == 7
+    assert [span.name for span in exporter.get_finished_spans()] == ["lookup"]
+
+
+def test_file_exporter_closes_its_file_on_shutdown(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    with mock.patch.object(settings, "otel_exporter", "file"), mock.patch.object(
+        settings, "otel_exporter_file", str(path)
+    ):
+        processor = _span_processor()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(processor)
+
+    with provider.get_tracer(__name__).start_as_current_span("lookup"):
+        pass
+    provider.shutdown()
+
+    assert json.loads(path.read_text())["name"] == "lookup"
+    assert processor.span_exporter.out.closed
+
+
+def test_request_spans_run_inside_the_prometheus_middleware():
+    with mock.patch.object(settings, "otel_enabled", True), mock.patch.object(
+        settings, "otel_exporter", "console"
+    ), mock.patch("opentelemetry.trace.set_tracer_provider"):
+        app = get_app()
+
+    assert [middleware.cls for middleware in app.user_middleware[:2]] == [
+        PrometheusMiddleware,
+        asgi.OpenTelemetryMiddleware,
+    ]
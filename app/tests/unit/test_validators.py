@@ -1,34 +1,61 @@
+from decimal import Decimal
+
 import pytest
+from pydantic import TypeAdapter, ValidationError
 
 from app.api.helpers.validators import (
-    decimal_validator,
-    empty_string_validator,
-    number_validator,
+    NonEmptyStr,
+    PositiveInt,
+    Price,
+    compatible_errors,
 )
 
 
-def test_empty_string_validator():
-    with pytest.raises(ValueError):
-        empty_string_validator("")
-    with pytest.raises(ValueError):
-        empty_string_validator("  ")
-    assert empty_string_validator("hello") == "hello"
-    assert empty_string_validator("  hello  ") == "hello"
+def test_non_empty_str():
+    non_empty_str = TypeAdapter(NonEmptyStr)
+    with pytest.raises(ValidationError):
+        non_empty_str.validate_python("")
+    with pytest.raises(ValidationError):
+        non_empty_str.validate_python("  ")
+    assert non_empty_str.validate_python("hello") == "hello"
+    assert non_empty_str.validate_python("  hello  ") == "hello"
+
 
+def test_price():
+    price = TypeAdapter(Price)
+    with pytest.raises(ValidationError):
+        price.validate_python(123.456)
+    with pytest.raises(ValidationError):
+        price.validate_python(123456.78965)
+    assert price.validate_python(12.34) == Decimal("12.34")
+    assert price.validate_python(12345.00) == Decimal("12345")
+    assert price.dump_json(price.validate_python(12.34)) == b"12.34"
 
-def test_decimal_validator():
-    with pytest.raises(ValueError):
-        decimal_validator(123.456)
-    with pytest.raises(ValueError):
-        decimal_validator(123456.78965)
-    assert decimal_validator(12.34) == 12.34
-    assert decimal_validator(12345.00) == 12345.00
 
+def test_positive_int():
+    positive_int = TypeAdapter(PositiveInt)
+    with pytest.raises(ValidationError):
+        positive_int.validate_python(0)
+    with pytest.raises(ValidationError):
+        positive_int.validate_python(-1)
+    assert positive_int.validate_python(1) == 1
+    assert positive_int.validate_python(100) == 100
 
-def test_number_validator():
-    with pytest.raises(ValueError):
-        number_validator(0)
-    with pytest.raises(ValueError):
-        number_validator(-1)
-    assert number_validator(1) == 1
-    assert number_validator(100) == 100
+
+@pytest.mark.parametrize(
+    "adapter, value, message",
+    [
+        (Price, "string", "value is not a valid float"),
+        (Price, 0, "The field must be greater than zero."),
+        (Price, 1.933, "The value cannot have more than two decimal places"),
+        (Price, 10000000000.93, "The value exceeds the expected size."),
+        (PositiveInt, -1, "The field must be greater than zero."),
+        (NonEmptyStr, " ", "Field cannot be an empty string"),
+    ],
+)
+def test_compatible_errors(adapter, value, message):
+    with pytest.raises(ValidationError) as error:
+        TypeAdapter(adapter).validate_python(value)
+    assert compatible_errors(error.value.errors()) == [
+        {"loc": [], "msg": message, "type": error.value.errors()[0]["type"]}
+    ]
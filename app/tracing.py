@@ -0,0 +1,156 @@
+"""
+Optional OpenTelemetry tracing.
+
+Requires the ``tracing`` extra (``poetry install -E tracing``). With
+OTEL_ENABLED off nothing is imported and ``traced`` returns the function
+untouched, so disabled tracing costs nothing per call.
+"""
+import inspect
+from functools import wraps
+
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.settings import settings
+
+
+def traced(func):
+    """Run every call of ``func`` in a span named after its qualified name."""
+    if not settings.otel_enabled:
+        return func
+
+    from opentelemetry import trace  # noqa: WPS433
+
+    tracer = trace.get_tracer(__name__)
+    name = func.__qualname__
+
+    if inspect.isasyncgenfunction(func):
+
+        @wraps(func)
+        async def async_gen_wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                async for item in func(*args, **kwargs):
+                    yield item
+
+        return async_gen_wrapper
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def coroutine_wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return await func(*args, **kwargs)
+
+        return coroutine_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.start_as_current_span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def traced_methods(cls):
+    """Apply ``traced`` to the public methods a class defines."""
+    for name, member in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(member):
+            setattr(cls, name, traced(member))
+    return cls
+
+
+def setup_tracing(app: FastAPI) -> None:
+    """Install the tracer provider and the request spans."""
+    if not settings.otel_enabled:
+        return
+
+    from opentelemetry import trace  # noqa: WPS433
+    from opentelemetry.instrumentation.fastapi import (  # noqa: WPS433
+        FastAPIInstrumentor,
+    )
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource  # noqa: WPS433
+    from opentelemetry.sdk.trace import TracerProvider  # noqa: WPS433
+    from opentelemetry.sdk.trace.sampling import (  # noqa: WPS433
+        ParentBased,
+        TraceIdRatioBased,
+    )
+
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        provider = TracerProvider(
+            resource=Resource.create({SERVICE_NAME: settings.service_name}),
+            sampler=ParentBased(TraceIdRatioBased(settings.otel_sample_ratio)),
+        )
+        provider.add_span_processor(_span_processor())
+        trace.set_tracer_provider(provider)
+
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics,docs,static")
+
+
+def shutdown_tracing() -> None:
+    """Export the spans still queued and release the exporters."""
+    if not settings.otel_enabled:
+        return
+
+    from opentelemetry import trace  # noqa: WPS433
+    from opentelemetry.sdk.trace import TracerProvider  # noqa: WPS433
+
+    provider = trace.get_tracer_provider()
+    if isinstance(provider, TracerProvider):
+        provider.shutdown()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Add a span per SQL statement run by ``engine``."""
+    if not settings.otel_enabled:
+        return
+
+    from opentelemetry import metrics, trace  # noqa: WPS433
+    from opentelemetry.instrumentation.sqlalchemy.engine import (  # noqa: WPS433
+        EngineTracer,
+    )
+
+    # SQLAlchemyInstrumentor instruments a single time, engines come one by one
+    EngineTracer(
+        trace.get_tracer(__name__),
+        engine.sync_engine,
+        metrics.get_meter(__name__).create_up_down_counter(
+            "db.client.connections.usage", unit="connections"
+        ),
+    )
+
+
+def _span_processor():
+    from opentelemetry.sdk.trace.export import (  # noqa: WPS433
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+    )
+
+    if settings.otel_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http import (  # noqa: WPS433
+            trace_exporter,
+        )
+
+        return BatchSpanProcessor(
+            trace_exporter.OTLPSpanExporter(
+                endpoint=settings.otel_exporter_otlp_endpoint
+            )
+        )
+    if settings.otel_exporter == "file":
+        return BatchSpanProcessor(_file_span_exporter(settings.otel_exporter_file))
+    return BatchSpanProcessor(ConsoleSpanExporter())
+
+
+def _file_span_exporter(path: str):
+    from opentelemetry.sdk.trace.export import (  # noqa: WPS433
+        ConsoleSpanExporter,
+    )
+
+    class FileSpanExporter(ConsoleSpanExporter):
+        def shutdown(self) -> None:
+            # ConsoleSpanExporter leaves its stream open, stdout by default
+            self.out.close()
+
+    return FileSpanExporter(
+        out=open(path, "a"),  # noqa: WPS515
+        formatter=lambda span: f"{span.to_json(indent=None)}\n",
+    )